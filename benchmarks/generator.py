@@ -0,0 +1,62 @@
+"""Synthetic DAG folders for the benchmarks.
+
+    python benchmarks/generator.py path/to/folder [objects]
+"""
+import json
+import os
+import random
+import sys
+import yaml
+
+SHEET_SCHEMA = {'fields': [{'name': 'id', 'type': 'STRING', 'mode': 'REQUIRED'}, {'name': 'amount', 'type': 'INTEGER'}]}
+SHEET_DEF = {'sourceFormat': 'GOOGLE_SHEETS', 'sourceUris': ['https://docs.google.com/spreadsheets/d/FAKE_SPREADSHEET_ID']}
+
+
+def generate_dag(dag_folder, objects=500, depth=10, fan_in=3, sql_lines=20, deps_density=0.1, zones=4, subzones=5, seed=42):
+    # Layered DAG: the first layer holds sheets, the others views and tables
+    # reading from up to fan_in objects of earlier layers. deps_density is the
+    # share of objects with an extra dependency declared only in deps.yaml.
+    # Returns the object ids per layer.
+    rng = random.Random(seed)
+    layers = [[] for _ in range(depth)]
+    dependencies = {}
+    for i in range(objects):
+        layer = i * depth // objects
+        zone, subzone = f"zone{rng.randrange(zones)}", f"sub{rng.randrange(subzones)}"
+        folder = os.path.join(dag_folder, zone, subzone)
+        os.makedirs(folder, exist_ok=True)
+        name = f"object_{i}"
+        obj_id = f"{zone}_{subzone}_{name}"
+
+        if layer == 0:
+            with open(os.path.join(folder, f"{name}.sheet.schema.json"), 'w') as file:
+                json.dump(SHEET_SCHEMA, file)
+            with open(os.path.join(folder, f"{name}.sheet.def.json"), 'w') as file:
+                json.dump(SHEET_DEF, file)
+        else:
+            upstream_layers = [upstream for previous in layers[:layer] for upstream in previous]
+            upstream = rng.sample(upstream_layers, min(rng.randint(1, fan_in), len(upstream_layers)))
+            kind = 'view' if rng.random() < 0.5 else 'table'
+            with open(os.path.join(folder, f"{name}.{kind}.sql"), 'w') as file:
+                file.write(_render_query(upstream, sql_lines))
+            if rng.random() < deps_density:
+                extra = rng.choice(upstream_layers)
+                dependencies.setdefault(zone, {}).setdefault(subzone, {}).setdefault(name, []).append(extra)
+        layers[layer].append(obj_id)
+
+    with open(os.path.join(dag_folder, 'deps.yaml'), 'w') as file:
+        yaml.safe_dump(dependencies, file)
+    return layers
+
+
+def _render_query(upstream, sql_lines):
+    # Padded with computed columns up to about sql_lines lines
+    columns = [f"  t0.amount * {n} AS amount_{n}," for n in range(max(sql_lines - 2 * len(upstream) - 2, 0))] + ["  t0.id"]
+    joins = [f"FROM `{{{{project_id}}}}.{{{{dataset}}}}.{upstream[0]}` t0"]
+    for n, obj_id in enumerate(upstream[1:], start=1):
+        joins.append(f"JOIN `{{{{project_id}}}}.{{{{dataset}}}}.{obj_id}` t{n}\n  ON t{n}.id = t0.id")
+    return "SELECT\n" + '\n'.join(columns) + '\n' + '\n'.join(joins) + ';\n'
+
+
+if __name__ == '__main__':
+    generate_dag(sys.argv[1], objects=int(sys.argv[2]) if len(sys.argv) > 2 else 500)
@@ -0,0 +1,51 @@
+"""Execution ordering on synthetic DAGs.
+
+    python benchmarks/ordering.py [sizes...]
+"""
+import random
+import sys
+import time
+import networkx as nx
+from bigdag.ordering import get_levels
+
+
+def synthetic_graph(size, depth=20, fan_in=3, seed=42):
+    # Layered DAG where every node reads from up to fan_in nodes of earlier layers
+    rng = random.Random(seed)
+    graph = nx.DiGraph()
+    layers = [[] for _ in range(depth)]
+    for i in range(size):
+        layer = i % depth
+        node = f"zone_subzone_object_{i}"
+        graph.add_node(node)
+        if layer > 0:
+            for _ in range(rng.randint(1, fan_in)):
+                upstream = rng.choice(layers[rng.randrange(layer)])
+                graph.add_edge(upstream, node)
+        layers[layer].append(node)
+    return graph
+
+
+def ancestors_order(graph):
+    # The previous ordering, one ancestors traversal per node
+    return sorted(nx.topological_sort(graph), key=lambda x: (len(nx.ancestors(graph, x)), x))
+
+
+def timed(function, graph):
+    start_time = time.perf_counter()
+    function(graph)
+    return time.perf_counter() - start_time
+
+
+def main(sizes):
+    print(f"{'nodes':>8} {'levels':>10} {'ancestors':>10}")
+    for size in sizes:
+        graph = synthetic_graph(size)
+        levels_time = timed(get_levels, graph)
+        # The quadratic ordering is only measured where it finishes in reasonable time
+        ancestors_time = f"{timed(ancestors_order, graph):9.3f}s" if size <= 10000 else '-'
+        print(f"{size:>8} {levels_time:9.3f}s {ancestors_time:>10}")
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or [1000, 10000, 100000])
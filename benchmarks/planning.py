@@ -0,0 +1,118 @@
+"""Planning time and peak memory on synthetic DAG folders, compared to stored baselines.
+
+    python benchmarks/planning.py [scenarios...] [--save] [--tolerance 1.5]
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from bigdag.auto_deps import AutoDeps
+from bigdag.bigquery_runner import BigQueryRunner
+from bigdag.catalog import Catalog
+from bigdag.dag import Dag
+from generator import generate_dag
+
+BASELINES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+SCENARIOS = {
+    'small': dict(objects=500, depth=10, fan_in=3, sql_lines=20, deps_density=0.1),
+    'wide': dict(objects=2000, depth=5, fan_in=8, sql_lines=20, deps_density=0.1),
+    'deep': dict(objects=2000, depth=100, fan_in=2, sql_lines=20, deps_density=0.1),
+    'large': dict(objects=5000, depth=20, fan_in=3, sql_lines=60, deps_density=0.3),
+}
+
+
+def measure(function, repeat=3):
+    # Best time of a few calls without tracing, then peak memory in a traced call
+    seconds = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start_time = time.perf_counter()
+        function()
+        seconds = min(seconds, time.perf_counter() - start_time)
+
+    gc.collect()
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds': round(seconds, 4), 'peak_mb': round(peak / 2 ** 20, 2)}
+
+
+def run_scenario(params):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dag_folder = os.path.join(tmp_dir, 'dag')
+        generate_dag(dag_folder, **params)
+        catalog = Catalog(dag_folder)
+        dag = Dag(dag_folder, catalog=catalog)
+        runner = BigQueryRunner('benchmark_project', 'benchmark_dataset', dag_folder)
+
+        def ordering():
+            dag._graph = None
+            dag._levels = None
+            dag.get_execution_order()
+
+        return {
+            'scan': measure(lambda: Catalog(dag_folder)),
+            'auto_deps': measure(lambda: AutoDeps(dag_folder, catalog=catalog).get_dag()),
+            'ordering': measure(ordering),
+            'render': measure(runner.get_commands),
+        }
+
+
+def load_baselines():
+    if not os.path.exists(BASELINES_FILE):
+        return {}
+    with open(BASELINES_FILE, 'r') as file:
+        return json.load(file)
+
+
+def compare(name, results, baseline, tolerance):
+    # A stage regresses when it is slower or bigger than tolerance times its baseline
+    regressions = []
+    print(f"{name}")
+    print(f"  {'stage':<10} {'seconds':>9} {'baseline':>9} {'peak MB':>9} {'baseline':>9}")
+    for stage, result in results.items():
+        expected = baseline.get(stage, {})
+        flags = [metric for metric in ('seconds', 'peak_mb')
+                 if metric in expected and result[metric] > tolerance * expected[metric]]
+        regressions.extend(f"{name}/{stage} {metric}" for metric in flags)
+        print(f"  {stage:<10} {result['seconds']:>9.3f} {expected.get('seconds', float('nan')):>9.3f} "
+              f"{result['peak_mb']:>9.2f} {expected.get('peak_mb', float('nan')):>9.2f}{'  [regression]' if flags else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('scenarios', nargs='*', help=f"Scenarios to run, out of {', '.join(SCENARIOS)}. Defaults to all.")
+    parser.add_argument('--save', action='store_true', help='Store the results as the new baselines.')
+    parser.add_argument('--tolerance', type=float, default=1.5, help='Allowed ratio to the baseline before failing.')
+    args = parser.parse_args()
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    baselines = load_baselines()
+    regressions = []
+    for name in args.scenarios or SCENARIOS:
+        results = run_scenario(SCENARIOS[name])
+        regressions.extend(compare(name, results, baselines.get(name, {}), args.tolerance))
+        baselines[name] = results
+
+    if args.save:
+        with open(BASELINES_FILE, 'w') as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+            file.write('\n')
+    elif regressions:
+        print(f"regressions: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
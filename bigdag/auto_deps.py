@@ -1,42 +1,63 @@
 import os
-from bigdag.utils import readfile
+from bigdag.catalog import Catalog
 
 class AutoDeps:
-    def __init__(self, dag_folder):
+    def __init__(self, dag_folder, catalog=None):
         self.dag_folder = dag_folder
+        self.catalog = catalog if catalog is not None else Catalog(dag_folder)
         self.dag_objects = self._find_dag_objects()
+        self._object_ids = set(self.dag_objects)
 
     def _find_dag_objects(self):
         dag_objects = {}
-        for root, _, files in os.walk(self.dag_folder):
-            for file in files:
-                if file.endswith('.json') or file.endswith('.sql'):
-                    name, ext = os.path.splitext(file)
-                    # Remove suffixes like .sheet, .view, .table
-                    if ext == '.json' or ext == '.sql':
-                        name = name.split('.')[0]  # Split at the first dot
-                    relative_path = os.path.relpath(root, self.dag_folder)
-                    obj_name = f"{relative_path.replace(os.sep, '_')}_{name}"
-                    dag_objects[obj_name] = os.path.join(root, file)
+        for root, file in self.catalog.entries:
+            if file.endswith('.json') or file.endswith('.sql'):
+                name, ext = os.path.splitext(file)
+                # Remove suffixes like .sheet, .view, .table
+                if ext == '.json' or ext == '.sql':
+                    name = name.split('.')[0]  # Split at the first dot
+                relative_path = os.path.relpath(root, self.dag_folder)
+                obj_name = f"{relative_path.replace(os.sep, '_')}_{name}"
+                dag_objects[obj_name] = os.path.join(root, file)
         return dag_objects
 
     def get_object_ids(self):
         return list(set(self.dag_objects.keys()))
 
+    def _get_identifiers(self, file_path):
+        # Tokenized by the catalog and kept in its cache until the file changes
+        return self.catalog.identifiers(file_path)
+
+    def get_references(self, obj_id):
+        # Identifiers of the query that are object ids, other than itself; a set
+        # intersection walks the smaller set, not every object of the DAG
+        file_path = self.dag_objects.get(obj_id)
+        if file_path is None or not file_path.endswith('.sql'):
+            return []
+        identifiers = self._get_identifiers(file_path)
+        return sorted(dep_id for dep_id in identifiers & self._object_ids if dep_id != obj_id)
+
+    def get_referencing(self, dep_id):
+        # Objects whose query mentions dep_id
+        return sorted(obj_id for obj_id, file_path in self.dag_objects.items()
+                      if obj_id != dep_id and file_path.endswith('.sql') and dep_id in self._get_identifiers(file_path))
+
+    def refresh(self, file_paths):
+        # To be called after the catalog re-read the given files
+        self.dag_objects = self._find_dag_objects()
+        self._object_ids = set(self.dag_objects)
+
     def get_dag(self):
         dependencies = {}
-        for obj_id, file_path in self.dag_objects.items():
-            if file_path.endswith('.sql'):
-                sql_content = readfile(file_path)
-                for dep_id in self.dag_objects.keys():
-                    if dep_id in sql_content:
-                        path_parts = obj_id.split('_')
-                        zone, subzone, obj_name = path_parts[0], path_parts[1], '_'.join(path_parts[2:])
-                        if zone not in dependencies:
-                            dependencies[zone] = {}
-                        if subzone not in dependencies[zone]:
-                            dependencies[zone][subzone] = {}
-                        if obj_name not in dependencies[zone][subzone]:
-                            dependencies[zone][subzone][obj_name] = []
-                        dependencies[zone][subzone][obj_name].append(dep_id)
-        return dependencies
\ No newline at end of file
+        for obj_id in self.dag_objects:
+            for dep_id in self.get_references(obj_id):
+                path_parts = obj_id.split('_')
+                zone, subzone, obj_name = path_parts[0], path_parts[1], '_'.join(path_parts[2:])
+                if zone not in dependencies:
+                    dependencies[zone] = {}
+                if subzone not in dependencies[zone]:
+                    dependencies[zone][subzone] = {}
+                if obj_name not in dependencies[zone][subzone]:
+                    dependencies[zone][subzone][obj_name] = []
+                dependencies[zone][subzone][obj_name].append(dep_id)
+        return dependencies
@@ -0,0 +1,326 @@
+import collections
+import contextlib
+import functools
+import importlib
+import json
+import re
+import subprocess
+import threading
+
+# Failures that are worth retrying: rate limits, backend and network errors
+TRANSIENT_ERROR_PATTERN = re.compile(
+    r'rateLimitExceeded|backendError|internalError|Exceeded rate limits|'
+    r'Service Unavailable|Bad Gateway|Gateway Timeout|Connection reset|Connection aborted|'
+    r'timed out|Error 5\d\d', re.IGNORECASE
+)
+
+
+def is_transient(message):
+    return bool(TRANSIENT_ERROR_PATTERN.search(message or ''))
+
+
+class BackendError(RuntimeError):
+    def __init__(self, message, details='', transient=False):
+        super().__init__(message)
+        self.details = details
+        self.transient = transient
+
+
+def metadata_query(project_id, dataset_name):
+    # Tables, views, columns and options of the whole dataset in a single query
+    schema = f"`{project_id}.{dataset_name}`.INFORMATION_SCHEMA"
+    return (
+        f"WITH columns AS (\n"
+        f"  SELECT table_name, ARRAY_AGG(STRUCT(column_name, data_type, is_nullable) ORDER BY ordinal_position) AS columns\n"
+        f"  FROM {schema}.COLUMNS GROUP BY table_name\n"
+        f"), options AS (\n"
+        f"  SELECT table_name, ARRAY_AGG(STRUCT(option_name, option_value)) AS options\n"
+        f"  FROM {schema}.TABLE_OPTIONS GROUP BY table_name\n"
+        f")\n"
+        f"SELECT t.table_name, t.table_type, v.view_definition, c.columns, o.options\n"
+        f"FROM {schema}.TABLES t\n"
+        f"LEFT JOIN {schema}.VIEWS v USING (table_name)\n"
+        f"LEFT JOIN columns c USING (table_name)\n"
+        f"LEFT JOIN options o USING (table_name)"
+    )
+
+
+def _option_value(value):
+    # Option values are SQL literals, such as "GOOGLE_SHEETS" or ["https://..."]
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def parse_metadata(rows):
+    # Rows of the metadata query -> {table name: metadata}
+    metadata = {}
+    for row in rows:
+        metadata[row['table_name']] = {
+            'type': row['table_type'],
+            'view_query': row.get('view_definition'),
+            'columns': [(column['column_name'], column['data_type'], column['is_nullable']) for column in row.get('columns') or []],
+            'options': {option['option_name']: _option_value(option['option_value']) for option in row.get('options') or []}
+        }
+    return metadata
+
+
+class ShellBackend:
+    """Runs each operation through the bq command line tool."""
+
+    def __init__(self, tail_lines=100):
+        # Lines of output kept in memory per command, the full output only goes to the log file
+        self.tail_lines = tail_lines
+
+    def execute(self, operation):
+        # Operations with argv run without a shell, with the query on stdin, so
+        # no quoting is needed and long queries stay clear of argument limits
+        command = operation['command']
+        argv = operation.get('argv')
+        stdin = operation.get('stdin')
+        tail = collections.deque(maxlen=self.tail_lines)
+        on_output = operation.get('on_output')
+        log_file = operation.get('log_file')
+        with open(log_file, 'a') if log_file else contextlib.nullcontext() as log:
+            if log:
+                log.write(f"$ {command}\n")
+            # bq reports some errors on stdout, so both streams are read together
+            with subprocess.Popen(argv or command, shell=not argv, stdin=subprocess.PIPE if stdin is not None else None,
+                                  stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True) as process:
+                writer = None
+                if stdin is not None:
+                    # Written from a thread, so a full stdout pipe cannot block it
+                    writer = threading.Thread(target=self._write_stdin, args=(process, stdin), daemon=True)
+                    writer.start()
+                for line in process.stdout:
+                    tail.append(line)
+                    if log:
+                        log.write(line)
+                    if on_output:
+                        on_output(line)
+                returncode = process.wait()
+                if writer is not None:
+                    writer.join()
+        output = ''.join(tail)
+        if returncode != 0:
+            raise BackendError(f"Command failed: {command}", details=output, transient=is_transient(output))
+        return {'output': output, 'stats': {}}
+
+    def _write_stdin(self, process, stdin):
+        try:
+            process.stdin.write(stdin)
+        except BrokenPipeError:
+            # The command exited without reading all of it, its output tells why
+            pass
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+    def _query(self, project_id, query, *flags):
+        argv = ['bq', 'query', '--project_id', project_id, '--use_legacy_sql=false', *flags]
+        return subprocess.run(argv, input=query, capture_output=True, text=True)
+
+    def estimate(self, operation):
+        result = self._query(operation['project_id'], operation.get('estimate_query', operation['query']), '--dry_run', '--format=json')
+        if result.returncode != 0:
+            raise BackendError(f"Dry run failed: {operation['description']}", details=result.stderr or result.stdout)
+        job = json.loads(result.stdout)
+        return int(job['statistics']['totalBytesProcessed'])
+
+    def fetch_metadata(self, project_id, dataset_name):
+        result = self._query(project_id, metadata_query(project_id, dataset_name), '--format=json', '--max_rows=1000000')
+        if result.returncode != 0:
+            details = result.stderr or result.stdout
+            if 'Not found: Dataset' in details:
+                return {}
+            raise BackendError(f"Fetching the metadata of {dataset_name} failed", details=details, transient=is_transient(details))
+        return parse_metadata(json.loads(result.stdout or '[]'))
+
+
+# Queries over Google Sheets external tables also need Drive access
+CLIENT_SCOPES = ('https://www.googleapis.com/auth/bigquery', 'https://www.googleapis.com/auth/drive')
+
+
+def _import_client_library(name):
+    try:
+        return importlib.import_module(name)
+    except ImportError as e:
+        raise RuntimeError("The client backend requires google-cloud-bigquery (pip install bigdag[client])") from e
+
+
+class ClientBackend:
+    """Runs each operation in-process through one long-lived BigQuery client."""
+
+    def __init__(self, project_id=None, pool_size=None, client=None):
+        self.client = client if client is not None else self._create_client(project_id, pool_size)
+
+    # The library is imported on first use, so a client can be passed in without it
+    @functools.cached_property
+    def _bigquery(self):
+        return _import_client_library('google.cloud.bigquery')
+
+    @functools.cached_property
+    def _exceptions(self):
+        return _import_client_library('google.api_core.exceptions')
+
+    @property
+    def _errors(self):
+        return self._exceptions.GoogleAPIError
+
+    @property
+    def _not_found(self):
+        return self._exceptions.NotFound
+
+    @property
+    def _transient_errors(self):
+        return (
+            self._exceptions.TooManyRequests,
+            self._exceptions.InternalServerError,
+            self._exceptions.BadGateway,
+            self._exceptions.ServiceUnavailable,
+            self._exceptions.GatewayTimeout
+        )
+
+    def _create_client(self, project_id, pool_size):
+        google_auth = _import_client_library('google.auth')
+        credentials, default_project = google_auth.default(scopes=CLIENT_SCOPES)
+        if not pool_size:
+            return self._bigquery.Client(project=project_id or default_project, credentials=credentials)
+
+        # Size the connection pool to the number of concurrent jobs
+        from google.auth.transport.requests import AuthorizedSession
+        from requests.adapters import HTTPAdapter
+
+        session = AuthorizedSession(credentials)
+        session.mount('https://', HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+        return self._bigquery.Client(project=project_id or default_project, credentials=credentials, _http=session)
+
+    def execute(self, operation):
+        handler = getattr(self, f"_{operation['action']}")
+        try:
+            job = handler(operation)
+        except self._errors as e:
+            transient = isinstance(e, self._transient_errors) or is_transient(str(e))
+            raise BackendError(f"Operation failed: {operation['description']}", details=str(e), transient=transient) from e
+        if job is None:
+            return {'output': '', 'stats': {}}
+        stats = {
+            'job_id': job.job_id,
+            'total_bytes_processed': job.total_bytes_processed,
+            'total_bytes_billed': job.total_bytes_billed,
+            'slot_millis': job.slot_millis,
+            'cache_hit': job.cache_hit
+        }
+        return {'output': f"job {job.job_id} processed {job.total_bytes_processed} bytes", 'stats': stats}
+
+    def estimate(self, operation):
+        job_config = self._bigquery.QueryJobConfig(dry_run=True, use_query_cache=False, use_legacy_sql=False)
+        try:
+            job = self.client.query(operation.get('estimate_query', operation['query']), job_config=job_config, project=operation['project_id'])
+        except self._errors as e:
+            raise BackendError(f"Dry run failed: {operation['description']}", details=str(e)) from e
+        return job.total_bytes_processed or 0
+
+    def fetch_metadata(self, project_id, dataset_name):
+        try:
+            rows = self.client.query(metadata_query(project_id, dataset_name), project=project_id).result()
+        except self._not_found:
+            return {}
+        except self._errors as e:
+            raise BackendError(f"Fetching the metadata of {dataset_name} failed", details=str(e),
+                               transient=isinstance(e, self._transient_errors)) from e
+        return parse_metadata(dict(row.items()) for row in rows)
+
+    def _dataset_ref(self, operation):
+        return f"{operation['project_id']}.{operation['dataset']}"
+
+    def _table_ref(self, operation):
+        return f"{self._dataset_ref(operation)}.{operation['object_id']}"
+
+    def _drop_dataset(self, operation):
+        self.client.delete_dataset(self._dataset_ref(operation), delete_contents=True, not_found_ok=True)
+
+    def _create_dataset(self, operation):
+        self.client.create_dataset(self._dataset_ref(operation))
+
+    def _drop_table(self, operation):
+        self.client.delete_table(self._table_ref(operation), not_found_ok=True)
+
+    def _create_external_table(self, operation):
+        with open(operation['schema_file']) as file:
+            schema = json.load(file)
+        with open(operation['def_file']) as file:
+            definition = json.load(file)
+        if isinstance(schema, dict):
+            schema = schema.get('fields', [])
+
+        table = self._bigquery.Table(self._table_ref(operation))
+        table.schema = [self._bigquery.SchemaField.from_api_repr(field) for field in schema]
+        table.external_data_configuration = self._bigquery.ExternalConfig.from_api_repr(definition)
+        self.client.create_table(table)
+
+    def _create_view(self, operation):
+        table = self._bigquery.Table(self._table_ref(operation))
+        table.view_query = operation['query']
+        self.client.create_table(table)
+
+    def _query_to_table(self, operation):
+        job_config = self._bigquery.QueryJobConfig(
+            destination=self._table_ref(operation),
+            write_disposition=self._bigquery.WriteDisposition.WRITE_TRUNCATE,
+            use_legacy_sql=False
+        )
+        job = self.client.query(operation['query'], job_config=job_config, project=operation['project_id'])
+        job.result()
+        return job
+
+    def _run_script(self, operation):
+        job = self.client.query(operation['query'], project=operation['project_id'])
+        job.result()
+        return job
+
+
+class FakeBackend:
+    """Records the operations instead of running them, for offline use and tests."""
+
+    def __init__(self, fail=(), estimates=None, transient_failures=None, metadata=None):
+        self.fail = set(fail)
+        self.estimates = estimates or {}
+        # Table name -> metadata, as returned by parse_metadata
+        self.metadata = metadata or {}
+        # Object id -> number of times its operations fail with a transient error
+        self.transient_failures = dict(transient_failures or {})
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def execute(self, operation):
+        with self._lock:
+            self.calls.append(operation)
+            obj_id = operation.get('object_id')
+            if self.transient_failures.get(obj_id):
+                self.transient_failures[obj_id] -= 1
+                raise BackendError(f"Command failed: {operation['command']}", details='rateLimitExceeded', transient=True)
+        # Batched operations fail when any of their objects does
+        if self.fail.intersection(operation.get('object_ids') or [operation.get('object_id')]):
+            raise BackendError(f"Command failed: {operation['command']}", details='fake failure')
+        return {'output': '', 'stats': {}}
+
+    def estimate(self, operation):
+        if operation.get('object_id') in self.fail:
+            raise BackendError(f"Dry run failed: {operation['description']}", details='fake failure')
+        return self.estimates.get(operation.get('object_id'), 0)
+
+    def fetch_metadata(self, project_id, dataset_name):
+        return self.metadata
+
+
+def create_backend(name, project_id=None, jobs=1):
+    if name == 'bq':
+        return ShellBackend()
+    if name == 'client':
+        return ClientBackend(project_id=project_id, pool_size=jobs if jobs > 1 else None)
+    if name == 'fake':
+        return FakeBackend()
+    raise ValueError(f"Unknown backend: {name}")
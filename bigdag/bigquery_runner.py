@@ -1,113 +1,641 @@
+import contextlib
+import hashlib
 import os
-import subprocess
+import random
+import threading
 import time
+from .backends import BackendError, ShellBackend
+from .catalog import Catalog
 from .dag import Dag
-from .utils import readfile
+from .executor import ParallelExecutor
+from .incremental import build_script, increment_query, load_config
+from .reconcile import external_table_matches, view_matches
+from .selectors import select_objects
+from .scheduler import get_groups, get_priorities
+from .state import BuildState, Checkpoint, DurationHistory
+from .telemetry import RunRecorder, critical_path
+from .templates import load_engine
+from .utils import format_bytes
 
 class BigQueryRunner:
-    def __init__(self, project_id, dataset_name, dag_folder):
+    def __init__(self, project_id, dataset_name, dag_folder, backend=None, state_file=None, cache_file=None,
+                 checkpoint_file=None, retries=3, retry_backoff=1.0, history_file=None, log_folder=None, templates=None,
+                 dag=None, slots=None, output_prefix=''):
         self.project_id = project_id
         self.dataset_name = dataset_name
         self.dag_folder = dag_folder
-        self.dag = Dag(dag_folder)
+        # The DAG and templates can be shared by the runners of several datasets
+        self.dag = dag if dag is not None else Dag(dag_folder, catalog=Catalog(dag_folder, cache_file=cache_file))
+        self.templates = templates if templates is not None else load_engine(dag_folder, self.dag.catalog)
+        self.backend = backend if backend is not None else ShellBackend()
+        self.state = BuildState(state_file, f"{project_id}.{dataset_name}") if state_file else None
+        self.checkpoint = Checkpoint(checkpoint_file, f"{project_id}.{dataset_name}") if checkpoint_file else None
+        self.retries = retries
+        # Full output of the operations, one file per object under a folder per dataset
+        self.log_folder = os.path.join(log_folder, dataset_name) if log_folder else None
+        self.retry_backoff = retry_backoff
+        # Semaphore shared with other runners, capping the objects built at the same time
+        self.slots = slots
+        # Printed before each line of output, to tell datasets running together apart
+        self.output_prefix = output_prefix
+        self._output_lock = threading.Lock()
+        self.recorder = RunRecorder()
+        self.listeners = [self.recorder]
+        self.history = DurationHistory(history_file, f"{project_id}.{dataset_name}") if history_file else None
+        if self.history is not None:
+            self.add_listener(self.history)
 
     def _apply_template(self, query):
-        # Replace placeholders and escape backticks
-        return query.replace("{{project_id}}", self.project_id).replace("{{dataset}}", self.dataset_name).replace("`", "\\`")
+        # Replace placeholders; project_id and dataset cannot be overridden by vars.yaml
+        return self.templates.render(query, {'project_id': self.project_id, 'dataset': self.dataset_name})
 
-    def get_commands(self, object_ids=None, recreate=False):
-        commands = []
+    def _render(self, sql_file):
+        try:
+            return self._apply_template(self.dag.catalog.read(sql_file))
+        except ValueError as e:
+            raise ValueError(f"{e} in {sql_file}") from e
 
-        # Determine the execution order
+    def _escape(self, query):
+        # Escape backticks for the printed bq shell command, operations run with argv instead
+        return query.replace("`", "\\`")
+
+    def _operation(self, action, description, command, **kwargs):
+        operation = {
+            'action': action,
+            'project_id': self.project_id,
+            'dataset': self.dataset_name,
+            'command': command,
+            'description': description
+        }
+        operation.update(kwargs)
+        return operation
+
+    def _to_commands(self, operations):
+        return [{'command': op['command'], 'description': op['description']} for op in operations]
+
+    def get_commands(self, object_ids=None, recreate=False, changed_only=False, view_batch_size=1, reconcile=False):
+        return self._to_commands(self.get_operations(object_ids=object_ids, recreate=recreate, changed_only=changed_only,
+                                                     view_batch_size=view_batch_size, reconcile=reconcile))
+
+    def get_operations(self, object_ids=None, recreate=False, changed_only=False, view_batch_size=1, reconcile=False):
+        execution_order = self._get_selected(object_ids, recreate=recreate, changed_only=changed_only)
+        existing = set()
+        if reconcile:
+            execution_order, existing = self._reconcile(execution_order, recreate)
+        return self._get_build_operations(execution_order, recreate=recreate, replaced=self._get_replaced(execution_order, existing),
+                                          view_batch_size=view_batch_size)
+
+    def _get_build_operations(self, execution_order, recreate=False, replaced=(), view_batch_size=1):
+        # Operations to create each object in the specified order
+        operations = []
+        for batch in self._get_batches(execution_order, view_batch_size=view_batch_size, recreate=recreate):
+            if len(batch) > 1:
+                operations.append(self.get_view_batch_operation(batch, replaced=replaced))
+            else:
+                operations.extend(self._get_object_build_operations(batch[0], recreate=recreate, replaced=replaced))
+        return operations
+
+    def _get_object_build_operations(self, obj_id, recreate=False, replaced=()):
+        # Existing views are replaced in place, so a failing definition keeps the old
+        # view; spreadsheets cannot be replaced and are dropped first
+        if obj_id in replaced and not recreate and self.dag.get_type(obj_id) == 'view':
+            return [self.get_view_replace_operation(obj_id)]
+        return self.get_object_operations(obj_id, recreate=recreate or obj_id in replaced)
+
+    def _get_selected(self, object_ids=None, recreate=False, changed_only=False):
+        if changed_only:
+            if recreate and not object_ids:
+                raise ValueError("Changed objects cannot be selected when recreating the whole dataset, select the objects to recreate")
+            return self.get_changed_objects(object_ids)
+        return self._get_execution_order(object_ids)
+
+    def _get_replaced(self, execution_order, existing=()):
+        # bq mk fails on existing objects, so the views and spreadsheets known to be in
+        # the dataset, or built before, are replaced; tables and incremental tables
+        # update their own content
+        return {obj_id for obj_id in execution_order if self.dag.get_type(obj_id) in ('view', 'sheet')
+                and (obj_id in existing or (self.state is not None and self.state.get(obj_id) is not None))}
+
+    def _get_batches(self, execution_order, view_batch_size=1, recreate=False):
+        # Views on the same level do not depend on each other, so up to
+        # view_batch_size of them are created by a single script
+        if view_batch_size <= 1 or recreate:
+            return [[obj_id] for obj_id in execution_order]
+        levels = {obj_id: index for index, level in enumerate(self.dag.get_levels()) for obj_id in level}
+        batches = []
+        open_batches = {}
+        for obj_id in execution_order:
+            if self.dag.get_type(obj_id) != 'view':
+                batches.append([obj_id])
+                continue
+            batch = open_batches.get(levels[obj_id])
+            if batch is None or len(batch) >= view_batch_size:
+                batch = open_batches[levels[obj_id]] = []
+                batches.append(batch)
+            batch.append(obj_id)
+        return batches
+
+    def _view_statement(self, obj_id, replace=False):
+        view_query = self._render(f"{self.dag.get_path_prefix(obj_id)}.view.sql")
+        create = 'CREATE OR REPLACE VIEW' if replace else 'CREATE VIEW'
+        return f"{create} `{self.project_id}.{self.dataset_name}.{obj_id}` AS\n{view_query.strip().rstrip(';')};"
+
+    def get_view_batch_operation(self, object_ids, replaced=()):
+        # Like views created one by one, only the views known to exist are replaced
+        script = '\n'.join(self._view_statement(obj_id, replace=obj_id in replaced) for obj_id in object_ids)
+        return self._operation(
+            'run_script', f"creating views {', '.join(object_ids)}",
+            f"bq query --project_id {self.project_id} --use_legacy_sql=false \"{self._escape(script)}\"",
+            object_ids=list(object_ids), query=script,
+            argv=['bq', 'query', '--project_id', self.project_id, '--use_legacy_sql=false'], stdin=script
+        )
+
+    def get_view_replace_operation(self, obj_id):
+        script = self._view_statement(obj_id, replace=True)
+        return self._operation(
+            'run_script', f"creating view {obj_id}",
+            f"bq query --project_id {self.project_id} --use_legacy_sql=false \"{self._escape(script)}\"",
+            object_id=obj_id, query=script,
+            argv=['bq', 'query', '--project_id', self.project_id, '--use_legacy_sql=false'], stdin=script
+        )
+
+    def _get_execution_order(self, object_ids=None):
         execution_order = self.dag.get_execution_order()
-        if object_ids is not None:
-            execution_order = [obj_id for obj_id in execution_order if obj_id in object_ids]
+        if object_ids:
+            selected = select_objects(self.dag, object_ids)
+            execution_order = [obj_id for obj_id in execution_order if obj_id in selected]
+        return execution_order
+
+    def get_object_operations(self, obj_id, recreate=False):
+        operations = []
+        obj_type = self.dag.get_type(obj_id)
+        path_prefix = self.dag.get_path_prefix(obj_id)
+        if recreate:
+            # Add operation to delete the existing object
+            description = f"dropping {obj_type} {obj_id}"
+            if obj_type == 'sheet':
+                description = f"dropping spreadsheet {obj_id}"
+            operations.append(self._operation(
+                'drop_table', description,
+                f"bq rm --force --project_id {self.project_id} --table {self.dataset_name}.{obj_id}",
+                object_id=obj_id, argv=['bq', 'rm', '--force', '--project_id', self.project_id, '--table', f"{self.dataset_name}.{obj_id}"]
+            ))
+        if obj_type == 'sheet':
+            schema_file = f"{path_prefix}.sheet.schema.json"
+            def_file = f"{path_prefix}.sheet.def.json"
+            operations.append(self._operation(
+                'create_external_table', f"creating spreadsheet {obj_id}",
+                f"bq mk --project_id {self.project_id} --schema {schema_file} --external_table_definition {def_file} {self.dataset_name}.{obj_id}",
+                object_id=obj_id, schema_file=schema_file, def_file=def_file,
+                argv=['bq', 'mk', '--project_id', self.project_id, '--schema', schema_file, '--external_table_definition', def_file,
+                      f"{self.dataset_name}.{obj_id}"]
+            ))
+        elif obj_type == 'view':
+            view_query = self._render(f"{path_prefix}.view.sql")
+            operations.append(self._operation(
+                'create_view', f"creating view {obj_id}",
+                f"bq mk --project_id {self.project_id} --use_legacy_sql=false --view \"{self._escape(view_query)}\" {self.dataset_name}.{obj_id}",
+                object_id=obj_id, query=view_query,
+                argv=['bq', 'mk', '--project_id', self.project_id, '--use_legacy_sql=false', '--view', view_query, f"{self.dataset_name}.{obj_id}"]
+            ))
+        elif obj_type == 'table':
+            table_query = self._render(f"{path_prefix}.table.sql")
+            operations.append(self._operation(
+                'query_to_table', f"creating table {obj_id}",
+                f"bq query --project_id {self.project_id} --use_legacy_sql=false --replace --destination_table={self.project_id}:{self.dataset_name}.{obj_id} \"{self._escape(table_query)}\"",
+                object_id=obj_id, query=table_query,
+                argv=['bq', 'query', '--project_id', self.project_id, '--use_legacy_sql=false', '--replace',
+                      f"--destination_table={self.project_id}:{self.dataset_name}.{obj_id}"], stdin=table_query
+            ))
+        elif obj_type == 'incremental':
+            config = self._get_incremental_config(path_prefix)
+            query = self._render(f"{path_prefix}.incremental.sql")
+            script = build_script(self.project_id, self.dataset_name, obj_id, query, config)
+            # Scripts cannot be dry run, so the increment is estimated instead, or
+            # the full query while the table does not exist yet
+            operations.append(self._operation(
+                'run_script', f"updating incremental table {obj_id}",
+                f"bq query --project_id {self.project_id} --use_legacy_sql=false \"{self._escape(script)}\"",
+                object_id=obj_id, query=script, estimate_query=increment_query(self.project_id, self.dataset_name, obj_id, query, config),
+                estimate_fallback=query,
+                argv=['bq', 'query', '--project_id', self.project_id, '--use_legacy_sql=false'], stdin=script
+            ))
+
+        return operations
+
+    def _get_incremental_config(self, path_prefix):
+        config_file = f"{path_prefix}.incremental.yaml"
+        if not self.dag.catalog.exists(config_file):
+            raise ValueError(f"Missing incremental config: {config_file}")
+        return load_config(self.dag.catalog.read(config_file), config_file)
+
+    def get_dataset_operations(self):
+        operations = []
+
+        # Operation to remove the dataset
+        operations.append(self._operation(
+            'drop_dataset', f"dropping dataset {self.dataset_name}",
+            f"bq rm --recursive --force --project_id {self.project_id} --dataset {self.dataset_name}",
+            argv=['bq', 'rm', '--recursive', '--force', '--project_id', self.project_id, '--dataset', self.dataset_name]
+        ))
+
+        # Operation to create the dataset
+        operations.append(self._operation(
+            'create_dataset', f"creating dataset {self.dataset_name}",
+            f"bq mk --project_id {self.project_id} --dataset {self.dataset_name}",
+            argv=['bq', 'mk', '--project_id', self.project_id, '--dataset', self.dataset_name]
+        ))
+
+        return operations
+
+    def get_recreate_all(self, view_batch_size=1):
+        operations = self.get_dataset_operations()
+
+        # Add the operations to recreate the objects, into the new empty dataset
+        operations.extend(self._get_build_operations(self._get_execution_order(), view_batch_size=view_batch_size))
+
+        return self._to_commands(operations)
+
+    def add_listener(self, listener):
+        # Listeners are called with a dict for every run event
+        self.listeners.append(listener)
+
+    def _emit(self, event, **fields):
+        fields.update(event=event, ts=time.time(), project_id=self.project_id, dataset=self.dataset_name)
+        for listener in self.listeners:
+            listener(fields)
+
+    def _execute(self, operation):
+        # Retry transient failures with exponential backoff and full jitter
+        attempt = 0
+        while True:
+            try:
+                return dict(self.backend.execute(operation), retries=attempt)
+            except BackendError as e:
+                if not e.transient or attempt >= self.retries:
+                    raise
+                delay = random.uniform(0, self.retry_backoff * 2 ** attempt)
+                attempt += 1
+                self._emit('operation_retry', object_id=operation.get('object_id'), description=operation['description'],
+                           attempt=attempt, delay=delay, error=e.details)
+                time.sleep(delay)
+
+    def _get_log_file(self, operation):
+        if operation.get('object_ids'):
+            return os.path.join(self.log_folder, f"batch_{operation['object_ids'][0]}.log")
+        return os.path.join(self.log_folder, f"{operation.get('object_id') or self.dataset_name}.log")
+
+    def _reset_log(self, name):
+        # Each run starts the log of an object over
+        if self.log_folder is not None:
+            log_file = os.path.join(self.log_folder, f"{name}.log")
+            if os.path.exists(log_file):
+                os.remove(log_file)
+
+    def _run_operation(self, operation, verbose=False, inline=True):
+        command = operation['command']
+        description = f"{self.output_prefix}{operation['description']}"
+        if inline:
+            print(f"{description} ", end='', flush=True)
+        if self.log_folder is not None:
+            operation = dict(operation, log_file=self._get_log_file(operation))
+        # Running one operation at a time, its output is shown as it arrives
+        stream = verbose and inline
+        if stream:
+            print(f"\nCommand: {command}", flush=True)
+            operation = dict(operation, on_output=lambda line: print(line, end='', flush=True))
+
+        start_time = time.time()
+        try:
+            result = self._execute(operation)
+        except BackendError as e:
+            self._emit('operation_end', object_id=operation.get('object_id'), description=description,
+                       status='failed', duration=time.time() - start_time, error=str(e))
+            with self._output_lock:
+                if not inline:
+                    print(f"{description} ", end='')
+                if stream:
+                    print("[failed]")
+                elif verbose:
+                    print(f"\nCommand: {command}")
+                    print(f"Error: {e.details}")
+                elif not inline:
+                    print("[failed]")
+            raise
+        elapsed_time = time.time() - start_time
+        self._emit('operation_end', object_id=operation.get('object_id'), description=description,
+                   status='ok', duration=elapsed_time, stats=result['stats'])
+
+        with self._output_lock:
+            if not inline:
+                print(f"{description} ", end='')
+            if stream:
+                print(f"[ok] {elapsed_time:.2f} secs", flush=True)
+            elif verbose:
+                print(f"\nCommand: {command}")
+                print(result['output'])
+            else:
+                print(f"[ok] {elapsed_time:.2f} secs", flush=True)
 
-        # Commands to create each object in the specified order
+        return result
+
+    def get_unchanged_objects(self, execution_order, metadata):
+        # Views and spreadsheets already deployed as they are defined; tables
+        # are always built, since their content depends on the data
+        unchanged = []
         for obj_id in execution_order:
             obj_type = self.dag.get_type(obj_id)
             path_prefix = self.dag.get_path_prefix(obj_id)
-            if recreate:
-                # Add command to delete the existing object
-                description = f"dropping {obj_type} {obj_id}"
-                if obj_type == 'sheet':
-                    description = f"dropping spreadsheet {obj_id}"
-                commands.append({
-                    'command': f"bq rm --force --project_id {self.project_id} --table {self.dataset_name}.{obj_id}",
-                    'description': description
-                })
-            if obj_type == 'sheet':
-                schema_file = f"{path_prefix}.sheet.schema.json"
-                def_file = f"{path_prefix}.sheet.def.json"
-                commands.append({
-                    'command': f"bq mk --project_id {self.project_id} --schema {schema_file} --external_table_definition {def_file} {self.dataset_name}.{obj_id}",
-                    'description': f"creating spreadsheet {obj_id}"
-                })
-            elif obj_type == 'view':
-                sql_file = f"{path_prefix}.view.sql"
-                view_query = readfile(sql_file)
-                view_query = self._apply_template(view_query)
-                commands.append({
-                    'command': f"bq mk --project_id {self.project_id} --use_legacy_sql=false --view \"{view_query}\" {self.dataset_name}.{obj_id}",
-                    'description': f"creating view {obj_id}"
-                })
-            elif obj_type == 'table':
-                sql_file = f"{path_prefix}.table.sql"
-                table_query = readfile(sql_file)
-                table_query = self._apply_template(table_query)
-                commands.append({
-                    'command': f"bq query --project_id {self.project_id} --use_legacy_sql=false --replace --destination_table={self.project_id}:{self.dataset_name}.{obj_id} \"{table_query}\"",
-                    'description': f"creating table {obj_id}"
-                })
-
-        return commands
-
-    def get_recreate_all(self):
-        commands = []
-
-        # Command to remove the dataset
-        commands.append({
-            'command': f"bq rm --recursive --force --project_id {self.project_id} --dataset {self.dataset_name}",
-            'description': f"dropping dataset {self.dataset_name}"
-        })
-
-        # Command to create the dataset
-        commands.append({
-            'command': f"bq mk --project_id {self.project_id} --dataset {self.dataset_name}",
-            'description': f"creating dataset {self.dataset_name}"
-        })
-
-        # Add the commands to recreate the objects
-        commands.extend(self.get_commands())
-
-        return commands
-
-    def run_commands(self, object_ids=None, recreate=False, verbose=False):
-        if recreate and not object_ids:
-            commands = self.get_recreate_all()
-        else:
-            commands = self.get_commands(object_ids=object_ids, recreate=recreate)
-        
+            existing = metadata.get(obj_id)
+            if existing is None:
+                continue
+            if obj_type == 'view':
+                query = self._render(f"{path_prefix}.view.sql")
+                if view_matches(query, existing):
+                    unchanged.append(obj_id)
+            elif obj_type == 'sheet':
+                schema = self.dag.catalog.read(f"{path_prefix}.sheet.schema.json")
+                definition = self.dag.catalog.read(f"{path_prefix}.sheet.def.json")
+                if external_table_matches(schema, definition, existing):
+                    unchanged.append(obj_id)
+        return unchanged
+
+    def _reconcile(self, execution_order, recreate=False):
+        if recreate:
+            raise ValueError("Reconciling with the dataset cannot be combined with recreating objects")
+        # A single listing of the dataset, instead of one call per object; returns the
+        # objects to build and the objects already in the dataset
+        metadata = self.backend.fetch_metadata(self.project_id, self.dataset_name)
+        unchanged = set(self.get_unchanged_objects(execution_order, metadata))
+        return [obj_id for obj_id in execution_order if obj_id not in unchanged], set(metadata)
+
+    def get_object_hashes(self, object_ids=None):
+        hashes = {}
+        dependencies = self.dag.get_dependencies()
+        execution_order = self.dag.get_execution_order()
+        if object_ids is not None:
+            # Only the selected objects and what they are built from
+            upstream = self.dag.get_upstream(object_ids)
+            execution_order = [obj_id for obj_id in execution_order if obj_id in upstream]
+
+        # Upstream hashes are part of the content, so changes propagate downstream
+        for obj_id in execution_order:
+            content = hashlib.sha256()
+            content.update(f"{obj_id}:{self.dag.get_type(obj_id)}".encode())
+            for source in self._get_object_sources(obj_id):
+                content.update(source.encode())
+            for dep_id in sorted(dependencies.get(obj_id, ())):
+                content.update(hashes[dep_id].encode())
+            hashes[obj_id] = content.hexdigest()
+
+        return hashes
+
+    def _get_object_sources(self, obj_id):
+        obj_type = self.dag.get_type(obj_id)
+        path_prefix = self.dag.get_path_prefix(obj_id)
+        if obj_type == 'sheet':
+            return [self.dag.catalog.read(f"{path_prefix}.sheet.schema.json"), self.dag.catalog.read(f"{path_prefix}.sheet.def.json")]
+        elif obj_type in ('view', 'table'):
+            return [self._render(f"{path_prefix}.{obj_type}.sql")]
+        elif obj_type == 'incremental':
+            return [self._render(f"{path_prefix}.incremental.sql"), self.dag.catalog.read(f"{path_prefix}.incremental.yaml")]
+        return []
+
+    def get_changed_objects(self, object_ids=None):
+        if self.state is None:
+            raise ValueError("A state file is required to select changed objects")
+        execution_order = self._get_execution_order(object_ids)
+        hashes = self.get_object_hashes(execution_order)
+        return [obj_id for obj_id in execution_order if self.state.get(obj_id) != hashes[obj_id]]
+
+    def estimate(self, object_ids=None, changed_only=False):
+        if changed_only:
+            return self._estimate_objects(self.get_changed_objects(object_ids))
+        return self._estimate_objects(self._get_execution_order(object_ids))
+
+    def _estimate_objects(self, execution_order):
+        estimates = []
+        for obj_id in execution_order:
+            for operation in self.get_object_operations(obj_id):
+                if 'query' not in operation:
+                    continue
+                total_bytes = self._estimate(operation)
+                estimates.append({'object_id': obj_id, 'zone': self.dag.get_zone(obj_id), 'bytes': total_bytes})
+        return estimates
+
+    def _estimate(self, operation):
+        try:
+            return self.backend.estimate(operation)
+        except BackendError as e:
+            if 'estimate_fallback' in operation and 'Not found: Table' in e.details:
+                # The incremental table is missing, its first run builds it in full
+                fallback = dict(operation, estimate_query=operation['estimate_fallback'])
+                del fallback['estimate_fallback']
+                return self._estimate(fallback)
+            # For instance when an upstream object was not created yet
+            return None
+
+    def print_estimate(self, estimates, max_bytes=None):
+        over_limit = []
+        zone_totals = {}
+        for estimate in estimates:
+            obj_id, total_bytes = estimate['object_id'], estimate['bytes']
+            if total_bytes is None:
+                print(f"{obj_id} [unknown]")
+                continue
+            zone_totals[estimate['zone']] = zone_totals.get(estimate['zone'], 0) + total_bytes
+            if max_bytes is not None and total_bytes > max_bytes:
+                over_limit.append(obj_id)
+                print(f"{obj_id} {format_bytes(total_bytes)} [over limit]")
+            else:
+                print(f"{obj_id} {format_bytes(total_bytes)}")
+
+        for zone, total_bytes in zone_totals.items():
+            print(f"zone {zone}: {format_bytes(total_bytes)}")
+        print(f"total: {format_bytes(sum(zone_totals.values()))}")
+        return over_limit
+
+    def run_commands(self, object_ids=None, recreate=False, verbose=False, jobs=1, changed_only=False, max_bytes=None, resume=False,
+                     zone_limits=None, view_batch_size=1, reconcile=False, existing=None):
         total_start_time = time.time()
 
-        for cmd_info in commands:
-            command = cmd_info['command']
-            description = cmd_info['description']
-            print(f"{description} ", end='', flush=True)
+        recreate_dataset = recreate and not object_ids
+        execution_order = self._get_selected(object_ids, recreate=recreate, changed_only=changed_only)
+        if recreate_dataset:
+            recreate = False
+        existing = set(existing or ())
+        if reconcile and not recreate_dataset:
+            selected = execution_order
+            execution_order, in_dataset = self._reconcile(execution_order, recreate)
+            existing |= in_dataset
+            for obj_id in selected:
+                if obj_id not in execution_order:
+                    self._emit('object_skipped', object_id=obj_id, status='unchanged')
+            print(f"{self.output_prefix}{len(selected) - len(execution_order)} objects unchanged in dataset {self.dataset_name}")
 
+        if self.checkpoint is not None:
+            if resume:
+                # Continue from the failure point of the previous run
+                execution_order = [obj_id for obj_id in execution_order if obj_id not in self.checkpoint.completed]
+                recreate_dataset = recreate_dataset and not self.checkpoint.dataset_created
+            else:
+                self.checkpoint.clear()
+        elif resume:
+            raise ValueError("A checkpoint file is required to resume a run")
+        hashes = self.get_object_hashes(execution_order) if self.state is not None else {}
+        replaced = set() if recreate_dataset else self._get_replaced(execution_order, existing)
+
+        if max_bytes is not None:
+            # Stop before anything runs when a query would scan too much
+            over_limit = self.print_estimate(self._estimate_objects(execution_order), max_bytes=max_bytes)
+            if over_limit:
+                raise RuntimeError(f"Estimated bytes processed over {format_bytes(max_bytes)}: {', '.join(over_limit)}")
+
+        if self.log_folder is not None:
+            os.makedirs(self.log_folder, exist_ok=True)
+        # Output of concurrent operations is printed in whole lines
+        inline = jobs == 1 and not self.output_prefix
+
+        if recreate_dataset:
+            # The dataset must exist before any object can be created
+            self._reset_log(self.dataset_name)
+            for operation in self.get_dataset_operations():
+                self._run_operation(operation, verbose=verbose, inline=inline)
+            if self.checkpoint is not None:
+                self.checkpoint.mark_dataset_created()
+
+        dependencies = self.dag.get_dependencies(execution_order)
+        end_times = {}
+        run_start_time = time.time()
+        self._emit('run_start', objects=len(execution_order), jobs=jobs)
+
+        def run_object(obj_id, replace_view=False):
+            # Queue wait: time between the object becoming ready and starting
             start_time = time.time()
-            result = subprocess.run(command, shell=True, capture_output=True, text=True)
-            elapsed_time = time.time() - start_time
-            if result.returncode != 0:
-                if verbose:
-                    print(f"\nCommand: {command}")
-                    print(f"Error: {result.stderr}")
-                raise RuntimeError(f"Command failed: {command}")
-            if verbose:
-                print(f"\nCommand: {command}")
-                print(result.stdout)
+            self._reset_log(obj_id)
+            ready_time = max([end_times[dep_id] for dep_id in dependencies.get(obj_id, ()) if dep_id in end_times] + [run_start_time])
+            self._emit('object_start', object_id=obj_id, queue_wait=start_time - ready_time)
+            stats = []
+            retries = 0
+            try:
+                if replace_view:
+                    operations = [self.get_view_replace_operation(obj_id)]
+                else:
+                    operations = self._get_object_build_operations(obj_id, recreate=recreate, replaced=replaced)
+                for operation in operations:
+                    result = self._run_operation(operation, verbose=verbose, inline=inline)
+                    stats.append(result['stats'])
+                    retries += result['retries']
+            except Exception as e:
+                self._emit('object_end', object_id=obj_id, status='failed', start=start_time, end=time.time(),
+                           duration=time.time() - start_time, queue_wait=start_time - ready_time, retries=retries, error=str(e))
+                raise
+            end_times[obj_id] = time.time()
+            self._emit('object_end', object_id=obj_id, status='ok', start=start_time, end=end_times[obj_id],
+                       duration=end_times[obj_id] - start_time, queue_wait=start_time - ready_time, retries=retries, stats=stats)
+            if self.state is not None:
+                self.state.set(obj_id, hashes[obj_id])
+            if self.checkpoint is not None:
+                self.checkpoint.mark_completed(obj_id)
+
+        def run_batch(batch):
+            if len(batch) == 1:
+                return run_object(batch[0])
+            start_time = time.time()
+            self._reset_log(f"batch_{batch[0]}")
+            for obj_id in batch:
+                self._emit('object_start', object_id=obj_id, queue_wait=start_time - run_start_time, batch=len(batch))
+            try:
+                result = self._run_operation(self.get_view_batch_operation(batch, replaced=replaced), verbose=verbose, inline=inline)
+            except BackendError:
+                # Create the views one by one, so the failures are attributed to their
+                # objects; the script stopped at the failing statement, so the views
+                # before it exist already and are replaced
+                errors = []
+                for obj_id in batch:
+                    try:
+                        run_object(obj_id, replace_view=True)
+                    except BackendError as e:
+                        errors.append(e)
+                if len(errors) == 1:
+                    raise errors[0]
+                if errors:
+                    raise RuntimeError('\n'.join(str(e) for e in errors))
+                return
+            end_time = time.time()
+            for obj_id in batch:
+                end_times[obj_id] = end_time
+                self._emit('object_end', object_id=obj_id, status='ok', start=start_time, end=end_time, duration=end_time - start_time,
+                           queue_wait=start_time - run_start_time, retries=result['retries'], stats=[result['stats']], batch=len(batch))
+                if self.state is not None:
+                    self.state.set(obj_id, hashes[obj_id])
+                if self.checkpoint is not None:
+                    self.checkpoint.mark_completed(obj_id)
+
+        def run_task(batch):
+            with self.slots if self.slots is not None else contextlib.nullcontext():
+                run_batch(batch)
+
+        batches = self._get_batches(execution_order, view_batch_size=view_batch_size, recreate=recreate)
+        status = 'failed'
+        try:
+            if jobs > 1:
+                self._run_parallel(batches, dependencies, run_task, jobs, zone_limits=zone_limits)
             else:
-                print(f"[ok] {elapsed_time:.2f} secs")
+                for batch in batches:
+                    run_task(batch)
+            status = 'ok'
+            if self.checkpoint is not None:
+                self.checkpoint.clear()
+        finally:
+            if self.state is not None:
+                self.state.save()
+            self._emit('run_end', status=status, duration=time.time() - run_start_time)
 
         total_elapsed_time = time.time() - total_start_time
-        print(f"all commands executed successfully in {total_elapsed_time:.2f} seconds.")
\ No newline at end of file
+        print(f"{self.output_prefix}all commands executed successfully in {total_elapsed_time:.2f} seconds.")
+
+    def print_report(self, top=10):
+        durations = self.recorder.get_durations()
+        if not durations:
+            print("no objects were built.")
+            return
+        execution_order = [obj_id for obj_id in self.dag.get_execution_order() if obj_id in durations]
+        path, total = critical_path(execution_order, self.dag.get_dependencies(execution_order), durations)
+
+        print(f"critical path: {total:.2f} secs")
+        for obj_id in path:
+            print(f"  {obj_id} {durations[obj_id]:.2f} secs")
+        print("slowest objects:")
+        for obj_id in sorted(durations, key=lambda obj_id: (-durations[obj_id], obj_id))[:top]:
+            queue_wait = self.recorder.objects[obj_id]['queue_wait']
+            print(f"  {obj_id} {durations[obj_id]:.2f} secs (waited {queue_wait:.2f} secs)")
+
+    def _run_parallel(self, batches, dependencies, run_batch, jobs, zone_limits=None):
+        # Each batch is a task, named after its first object
+        execution_order = [batch[0] for batch in batches]
+        members = {batch[0]: batch for batch in batches}
+        task_of = {obj_id: batch[0] for batch in batches for obj_id in batch}
+        task_dependencies = {task: {task_of[dep_id] for obj_id in members[task] for dep_id in dependencies.get(obj_id, ()) if dep_id in task_of} - {task}
+                             for task in execution_order}
+
+        durations = {}
+        if self.history is not None:
+            for task in execution_order:
+                known = [duration for duration in map(self.history.get, members[task]) if duration is not None]
+                durations[task] = max(known) if known else None
+        priorities = get_priorities(execution_order, task_dependencies, durations)
+
+        def groups(task):
+            return {group for obj_id in members[task] for group in get_groups(self.dag.get_folder(obj_id))}
+
+        executor = ParallelExecutor(jobs, limits=zone_limits)
+        _, failed, cancelled = executor.run(execution_order, task_dependencies, lambda task: run_batch(members[task]),
+                                            priority=priorities.get, groups=groups)
+
+        for obj_id in [obj_id for task in cancelled for obj_id in members[task]]:
+            self._emit('object_skipped', object_id=obj_id, status='skipped')
+            print(f"{self.output_prefix}skipped {obj_id} (upstream failed)")
+        if failed:
+            errors = '\n'.join(str(failed[task]) for task in execution_order if task in failed)
+            raise RuntimeError(errors)
@@ -0,0 +1,135 @@
+import json
+import os
+import re
+from bigdag.utils import readfile
+
+CATALOG_EXTENSIONS = ('.json', '.sql', '.yaml')
+CACHE_VERSION = 2
+
+# Whole identifiers, so `{{project_id}}.{{dataset}}.x` yields project_id, dataset and x
+IDENTIFIER_PATTERN = re.compile(r'\w+')
+
+
+def scan_files(dag_folder):
+    # Yields (folder, file name, stat) for the DAG files, one os.scandir per folder
+    folders = [dag_folder]
+    while folders:
+        root = folders.pop(0)
+        with os.scandir(root) as scanner:
+            dir_entries = sorted(scanner, key=lambda entry: entry.name)
+        for entry in dir_entries:
+            # Skip hidden folders such as .bigdag, where the build state is kept
+            if entry.is_dir():
+                if not entry.name.startswith('.'):
+                    folders.append(entry.path)
+                continue
+            if entry.name.endswith(CATALOG_EXTENSIONS):
+                yield root, entry.name, entry.stat()
+
+
+class Catalog:
+    """Single scan of a DAG folder, holding the contents of its files and the identifiers of its queries."""
+
+    def __init__(self, dag_folder, cache_file=None):
+        self.dag_folder = dag_folder
+        self.cache_file = cache_file
+        self.entries = []
+        self.files = {}
+        self._changed = False
+        self._scan()
+
+    def _load_cache(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r') as file:
+                cache = json.load(file)
+        except ValueError:
+            return {}
+        if cache.get('version') != CACHE_VERSION or cache.get('dag_folder') != os.path.abspath(self.dag_folder):
+            return {}
+        return cache.get('files', {})
+
+    def _save_cache(self):
+        folder = os.path.dirname(self.cache_file)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        cache = {
+            'version': CACHE_VERSION,
+            'dag_folder': os.path.abspath(self.dag_folder),
+            'files': self.files
+        }
+        tmp_file = f"{self.cache_file}.tmp"
+        with open(tmp_file, 'w') as file:
+            # Identifier sets are stored as sorted lists
+            json.dump(cache, file, default=sorted)
+        os.replace(tmp_file, self.cache_file)
+        self._changed = False
+
+    def save(self):
+        # Write the cache when files were read or queries tokenized since it was loaded
+        if self.cache_file and self._changed:
+            self._save_cache()
+
+    def _scan(self):
+        cached_files = self._load_cache()
+        changed = len(cached_files) == 0
+
+        for root, name, stat in scan_files(self.dag_folder):
+            file_path = os.path.join(root, name)
+            cached = cached_files.get(file_path)
+            if cached and cached['mtime_ns'] == stat.st_mtime_ns and cached['size'] == stat.st_size:
+                self.files[file_path] = cached
+            else:
+                self.files[file_path] = self._read_file(file_path, stat)
+                changed = True
+            self.entries.append((root, name))
+
+        self._changed = changed or len(cached_files) != len(self.files)
+        self.save()
+
+    def _read_file(self, file_path, stat):
+        return {
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'content': readfile(file_path)
+        }
+
+    def refresh(self, file_paths):
+        # Re-read the given files, which may have been added, changed or removed
+        for file_path in file_paths:
+            root, name = os.path.split(file_path)
+            if not name.endswith(CATALOG_EXTENSIONS):
+                continue
+            if os.path.exists(file_path):
+                if file_path not in self.files:
+                    self.entries.append((root, name))
+                self.files[file_path] = self._read_file(file_path, os.stat(file_path))
+            elif file_path in self.files:
+                del self.files[file_path]
+                self.entries = [entry for entry in self.entries if os.path.join(*entry) != file_path]
+        self._changed = True
+        self.save()
+
+    def read(self, file_path):
+        cached = self.files.get(file_path)
+        if cached is None:
+            return readfile(file_path)
+        return cached['content']
+
+    def identifiers(self, file_path):
+        # Set of the identifiers of a query, such as the object ids it reads; tokenized
+        # once per change of the file and kept in the cache, so warm starts skip it
+        cached = self.files.get(file_path)
+        if cached is None:
+            return set(IDENTIFIER_PATTERN.findall(readfile(file_path)))
+        identifiers = cached.get('identifiers')
+        if identifiers is None:
+            identifiers = cached['identifiers'] = set(IDENTIFIER_PATTERN.findall(cached['content']))
+            self._changed = True
+        elif not isinstance(identifiers, set):
+            identifiers = cached['identifiers'] = set(identifiers)
+        return identifiers
+
+    def exists(self, file_path):
+        return file_path in self.files or os.path.exists(file_path)
@@ -1,37 +1,202 @@
 import click
 import os
-from .bigquery_runner import BigQueryRunner
+from .backends import create_backend
+from .catalog import Catalog
+from .fanout import create_runners as create_dataset_runners, print_failures, read_datasets_file, run_datasets
+from .lineage import LineageIndex
+from .scheduler import parse_limits
+from .telemetry import JsonLinesWriter
+from .progress import ProgressView
+from .utils import format_bytes
+from .watch import Watcher
 
-@click.command(context_settings=dict(ignore_unknown_options=True))
-@click.option('-p', '--project', 'project_id', default=lambda: os.environ.get('BIGDAG_PROJECT_ID', None), help='Google Cloud project ID. Defaults to the BIGDAG_PROJECT_ID environment variable if not provided.')
-@click.option('-f', '--folder', 'dag_folder', default='.', show_default=True, help='Path to the DAG folder.')
-@click.option('-d', '--dataset', 'dataset_name', required=True, help='Name of the dataset.')
-@click.option('-r', '--recreate', is_flag=True, help='Recreate the dataset if it exists.')
-@click.option('-dr', '--dry-run', 'dry', is_flag=True, help='Print the commands without executing them.')
-@click.option('-v', '--verbose', is_flag=True, help='Enable verbose output.')
-@click.argument('object_ids', nargs=-1)
-def cli(dag_folder, dataset_name, project_id, recreate, dry, verbose, object_ids):
+class DefaultGroup(click.Group):
+    """Group running the run command when no command is given, as in `bigdag -d sales`."""
+
+    def parse_args(self, ctx, args):
+        if not args or (args[0] not in self.commands and args[0] not in ('--help', '-h')):
+            args = ['run'] + list(args)
+        return super().parse_args(ctx, args)
+
+
+@click.group(cls=DefaultGroup)
+def cli():
     """Entry point for the engine CLI."""
+
+
+def runner_options(command):
+    # Options shared by the commands that build a dataset
+    options = [
+        click.option('-p', '--project', 'project_id', default=lambda: os.environ.get('BIGDAG_PROJECT_ID', None), help='Google Cloud project ID. Defaults to the BIGDAG_PROJECT_ID environment variable if not provided.'),
+        click.option('-f', '--folder', 'dag_folder', default='.', show_default=True, help='Path to the DAG folder.'),
+        click.option('-d', '--dataset', 'dataset_names', multiple=True, help='Name of the dataset. Can be repeated to deploy to several datasets at the same time.'),
+        click.option('--datasets-file', default=None, type=click.Path(exists=True, dir_okay=False), help='File with the names of more datasets to deploy to, one per line.'),
+        click.option('-v', '--verbose', is_flag=True, help='Enable verbose output.'),
+        click.option('-j', '--jobs', default=1, show_default=True, type=click.IntRange(min=1), help='Number of objects to build in parallel.'),
+        click.option('-b', '--backend', 'backend_name', default='bq', show_default=True, type=click.Choice(['bq', 'client', 'fake']), help='How to run the operations: the bq CLI, an in-process BigQuery client or a fake backend that only records them.'),
+        click.option('--state-file', default=None, help='File where the content hash of each built object is kept. Defaults to .bigdag/state.json in the DAG folder.'),
+        click.option('--no-cache', is_flag=True, help='Do not keep the scanned DAG files in .bigdag/catalog.json inside the DAG folder.'),
+        click.option('--events', 'events_file', default=None, help='Append a JSON line per run event (object start/end, timings, job statistics) to this file.'),
+        click.option('--retries', default=3, show_default=True, type=click.IntRange(min=0), help='Times to retry an operation that failed with a transient error, with exponential backoff.'),
+        click.option('--checkpoint-file', default=None, help='File where the objects completed by a run are recorded. Defaults to .bigdag/checkpoint.jsonl in the DAG folder.'),
+        click.option('--history-file', default=None, help='File where the average build duration of each object is kept, to start the longest paths first. Defaults to .bigdag/history.jsonl in the DAG folder.'),
+        click.option('--log-dir', 'log_folder', default=None, help='Folder where the full output of each object is written, in a subfolder per dataset. Defaults to .bigdag/logs in the DAG folder.'),
+        click.option('--progress', is_flag=True, help='Print the running, queued and done objects every few seconds.'),
+    ]
+    for option in reversed(options):
+        command = option(command)
+    return command
+
+
+def create_runners(project_id, dag_folder, dataset_names, datasets_file, jobs, backend_name, state_file, no_cache, events_file, retries,
+                   checkpoint_file, history_file, log_folder, progress):
     if project_id is None:
         raise click.UsageError("Project ID must be provided either via the --project option or the BIGDAG_PROJECT_ID environment variable.")
-    
-    runner = BigQueryRunner(project_id, dataset_name, dag_folder)
-    
+    dataset_names = list(dataset_names)
+    if datasets_file:
+        dataset_names.extend(read_datasets_file(datasets_file))
+    if not dataset_names:
+        raise click.UsageError("At least one dataset must be provided with --dataset or --datasets-file.")
+    backend = create_backend(backend_name, project_id=project_id, jobs=jobs)
+    if backend_name == 'fake':
+        # Nothing is built, so nothing is recorded as built
+        state_file = checkpoint_file = history_file = None
+    else:
+        if state_file is None:
+            state_file = os.path.join(dag_folder, '.bigdag', 'state.json')
+        if checkpoint_file is None:
+            checkpoint_file = os.path.join(dag_folder, '.bigdag', 'checkpoint.jsonl')
+        if history_file is None:
+            history_file = os.path.join(dag_folder, '.bigdag', 'history.jsonl')
+    if log_folder is None:
+        log_folder = os.path.join(dag_folder, '.bigdag', 'logs')
+    cache_file = None if no_cache else os.path.join(dag_folder, '.bigdag', 'catalog.json')
+    runners = create_dataset_runners(project_id, dag_folder, list(dict.fromkeys(dataset_names)), jobs=jobs, cache_file=cache_file,
+                                     backend=backend, state_file=state_file, checkpoint_file=checkpoint_file, retries=retries,
+                                     history_file=history_file, log_folder=log_folder)
+    # One writer, so the datasets running at the same time append under the same lock
+    events_writer = JsonLinesWriter(events_file) if events_file else None
+    for runner in runners:
+        if events_writer is not None:
+            runner.add_listener(events_writer)
+        if progress:
+            runner.add_listener(ProgressView(prefix=runner.output_prefix))
+    return runners
+
+
+@cli.command(context_settings=dict(ignore_unknown_options=True))
+@runner_options
+@click.option('-r', '--recreate', is_flag=True, help='Recreate the dataset if it exists.')
+@click.option('-dr', '--dry-run', 'dry', is_flag=True, help='Print the commands without executing them.')
+@click.option('-c', '--changed', 'changed_only', is_flag=True, help='Only build objects whose content or upstream objects changed since the last build.')
+@click.option('-e', '--estimate', is_flag=True, help='Dry run the queries and print the estimated bytes processed per object and zone, without executing them.')
+@click.option('--max-bytes', default=None, type=click.IntRange(min=0), help='Flag objects estimated to process more bytes than this, and fail the run before anything executes.')
+@click.option('--report', is_flag=True, help='Print the critical path and the slowest objects after the run.')
+@click.option('--resume', is_flag=True, help='Skip the objects already built by the previous run that failed, and continue from there.')
+@click.option('--zone-limit', 'zone_limits', multiple=True, help='Maximum objects of a zone or zone/subzone running at the same time, as zone=N. Can be repeated.')
+@click.option('--view-batch-size', default=1, show_default=True, type=click.IntRange(min=1), help='Create up to this many independent views with a single multi-statement script.')
+@click.option('--reconcile', is_flag=True, help='Read the metadata of the dataset and skip the views and spreadsheets already deployed as defined.')
+@click.argument('object_ids', nargs=-1)
+def run(project_id, dag_folder, dataset_names, datasets_file, verbose, jobs, backend_name, state_file, no_cache, events_file, retries, checkpoint_file, history_file,
+        log_folder, progress, recreate, dry, changed_only, estimate, max_bytes, report, resume, zone_limits, view_batch_size, reconcile, object_ids):
+    """Build the objects of the DAG into the dataset."""
     try:
-        if dry:
+        runners = create_runners(project_id, dag_folder, dataset_names, datasets_file, jobs, backend_name, state_file, no_cache, events_file,
+                                 retries, checkpoint_file, history_file, log_folder, progress)
+
+        if estimate:
+            over_limit = []
+            for runner in runners:
+                if len(runners) > 1:
+                    print(f"dataset {runner.dataset_name}:")
+                estimates = runner.estimate(object_ids=object_ids, changed_only=changed_only)
+                over_limit.extend(runner.print_estimate(estimates, max_bytes=max_bytes))
+            if over_limit:
+                raise RuntimeError(f"Estimated bytes processed over {format_bytes(max_bytes)}: {', '.join(dict.fromkeys(over_limit))}")
+        elif dry:
             # Only print the commands without descriptions
-            if recreate and not object_ids:
-                commands = runner.get_recreate_all()
-            else:
-                commands = runner.get_commands(object_ids=object_ids, recreate=recreate)
-            for cmd_info in commands:
-                print(cmd_info['command'])
+            for runner in runners:
+                if recreate and not object_ids and not changed_only:
+                    commands = runner.get_recreate_all(view_batch_size=view_batch_size)
+                else:
+                    commands = runner.get_commands(object_ids=object_ids, recreate=recreate, changed_only=changed_only,
+                                                   view_batch_size=view_batch_size, reconcile=reconcile)
+                for cmd_info in commands:
+                    print(cmd_info['command'])
         else:
-            runner.run_commands(object_ids=object_ids, recreate=recreate, verbose=verbose)
+            run_kwargs = dict(object_ids=object_ids, recreate=recreate, verbose=verbose, jobs=jobs, changed_only=changed_only,
+                              max_bytes=max_bytes, resume=resume, zone_limits=parse_limits(zone_limits),
+                              view_batch_size=view_batch_size, reconcile=reconcile)
+            try:
+                if len(runners) == 1:
+                    runners[0].run_commands(**run_kwargs)
+                else:
+                    failures = run_datasets(runners, **run_kwargs)
+                    print_failures(runners, failures)
+                    if failures:
+                        raise RuntimeError(f"{len(failures)} of {len(runners)} datasets failed: {', '.join(sorted(failures))}")
+            finally:
+                if report:
+                    for runner in runners:
+                        if len(runners) > 1:
+                            print(f"dataset {runner.dataset_name}:")
+                        runner.print_report()
     except ValueError as e:
         print(e)
+        # Non-zero exit code, so scripts and CI can stop on a failed run
+        click.get_current_context().exit(1)
     except RuntimeError as e:
         print(e)
+        click.get_current_context().exit(1)
+
+
+@cli.command()
+@runner_options
+@click.option('--interval', default=1.0, show_default=True, type=click.FloatRange(min=0, min_open=True), help='Seconds between checks of the DAG folder for changes.')
+@click.option('--debounce', default=0.5, show_default=True, type=click.FloatRange(min=0), help='Seconds without further changes to wait for before deploying.')
+@click.argument('object_ids', nargs=-1)
+def watch(project_id, dag_folder, dataset_names, datasets_file, verbose, jobs, backend_name, state_file, no_cache, events_file, retries, checkpoint_file, history_file,
+          log_folder, progress, interval, debounce, object_ids):
+    """Redeploy the objects whose files change, and the objects depending on them."""
+    try:
+        runners = create_runners(project_id, dag_folder, dataset_names, datasets_file, jobs, backend_name, state_file, no_cache, events_file,
+                                 retries, checkpoint_file, history_file, log_folder, progress)
+    except ValueError as e:
+        print(e)
+        click.get_current_context().exit(1)
+    except RuntimeError as e:
+        print(e)
+        click.get_current_context().exit(1)
+    if len(runners) > 1:
+        raise click.UsageError("Watch mode deploys to a single dataset.")
+    runner = runners[0]
+    Watcher(runner, interval=interval, debounce=debounce, jobs=jobs, verbose=verbose, object_ids=list(object_ids) or None).watch()
+
+
+@cli.command()
+@click.option('-f', '--folder', 'dag_folder', default='.', show_default=True, help='Path to the DAG folder.')
+@click.option('--lineage-file', default=None, help='SQLite file with the column lineage index. Defaults to .bigdag/lineage.db in the DAG folder.')
+@click.option('--no-cache', is_flag=True, help='Do not keep the scanned DAG files in .bigdag/catalog.json inside the DAG folder.')
+@click.argument('column')
+def impact(dag_folder, lineage_file, no_cache, column):
+    """List the objects reading COLUMN, given as object_id.column, directly or through other objects."""
+    if '.' not in column:
+        raise click.UsageError("The column must be given as object_id.column")
+    obj_id, column_name = column.rsplit('.', 1)
+    if lineage_file is None:
+        lineage_file = os.path.join(dag_folder, '.bigdag', 'lineage.db')
+    cache_file = None if no_cache else os.path.join(dag_folder, '.bigdag', 'catalog.json')
+
+    index = LineageIndex(lineage_file)
+    try:
+        index.update(dag_folder, Catalog(dag_folder, cache_file=cache_file))
+        impacted = index.get_impact(obj_id, column_name)
+    finally:
+        index.close()
+    if not impacted:
+        print(f"no objects read {column}")
+    for reader, (depth, source) in sorted(impacted.items(), key=lambda item: (item[1][0], item[0])):
+        print(reader if depth == 1 else f"{reader} (through {source})")
 
 if __name__ == "__main__":
-    cli()
\ No newline at end of file
+    cli()
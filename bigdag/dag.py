@@ -2,21 +2,66 @@ import os
 import yaml
 import networkx as nx
 from bigdag.auto_deps import AutoDeps
-from bigdag.utils import readfile
+from bigdag.catalog import Catalog
+from bigdag.ordering import get_levels, get_nearest_dependencies
+
+
+def _path_prefix(file_path):
+    # Extract everything before the first dot in the file name
+    base_name = os.path.basename(file_path)
+    prefix = base_name.split('.')[0]
+    return os.path.join(os.path.dirname(file_path), prefix)
+
+
+def find_dag_objects(dag_folder, entries):
+    # Object id -> (type, file), for the (folder, file name) entries of a catalog
+    dag_objects = {}
+    for root, file in entries:
+        if file.endswith('.json') or file.endswith('.sql'):
+            name, ext = os.path.splitext(file)
+            relative_path = os.path.relpath(root, dag_folder)
+            obj_name = f"{relative_path.replace(os.sep, '_')}_{name.split('.')[0]}"
+            obj_type = _determine_type(name, ext)
+            file_path = os.path.join(root, file)
+            dag_objects[obj_name] = (obj_type, file_path)
+    return dag_objects
+
+
+def _determine_type(name, extension):
+    if extension == '.json':
+        return 'sheet'
+    elif extension == '.sql':
+        if name.endswith('.incremental'):
+            return 'incremental'
+        elif 'view' in name:
+            return 'view'
+        elif 'table' in name:
+            return 'table'
+    return None
 
 class Dag:
-    def __init__(self, dag_folder):
+    def __init__(self, dag_folder, catalog=None):
         self.dag_folder = dag_folder
+        self.catalog = catalog if catalog is not None else Catalog(dag_folder)
         self.deps_file = os.path.join(dag_folder, 'deps.yaml')
+        self._load()
+
+    def _load(self):
         self.dag_objects = self._find_dag_objects()
         self.dependencies = self._load_dependencies()
-        self.auto_deps = AutoDeps(dag_folder).get_dag()
+        self.manual_deps = self._flatten_dependencies(self.dependencies)
+        self._auto_deps = AutoDeps(self.dag_folder, catalog=self.catalog)
+        self.auto_deps = self._auto_deps.get_dag()
+        # Keep the identifiers of the queries for the next run
+        self.catalog.save()
         self._merge_dependencies()
+        self._graph = None
+        self._levels = None
 
     def _load_dependencies(self):
-        if not os.path.exists(self.deps_file):
+        if not self.catalog.exists(self.deps_file):
             return {}
-        dependencies = yaml.safe_load(readfile(self.deps_file))
+        dependencies = yaml.safe_load(self.catalog.read(self.deps_file))
         if not dependencies:
             dependencies = {}
         return dependencies
@@ -35,27 +80,7 @@ class Dag:
         merge_dicts(self.dependencies, self.auto_deps)
 
     def _find_dag_objects(self):
-        dag_objects = {}
-        for root, _, files in os.walk(self.dag_folder):
-            for file in files:
-                if file.endswith('.json') or file.endswith('.sql'):
-                    name, ext = os.path.splitext(file)
-                    relative_path = os.path.relpath(root, self.dag_folder)
-                    obj_name = f"{relative_path.replace(os.sep, '_')}_{name.split('.')[0]}"
-                    obj_type = self._determine_type(name, ext)
-                    file_path = os.path.join(root, file)
-                    dag_objects[obj_name] = (obj_type, file_path)
-        return dag_objects
-
-    def _determine_type(self, name, extension):
-        if extension == '.json':
-            return 'sheet'
-        elif extension == '.sql':
-            if 'view' in name:
-                return 'view'
-            elif 'table' in name:
-                return 'table'
-        return None
+        return find_dag_objects(self.dag_folder, self.catalog.entries)
 
     def _build_dependency_graph(self):
         graph = nx.DiGraph()
@@ -65,36 +90,130 @@ class Dag:
             graph.add_node(obj_name)
 
         # Add edges based on dependencies
+        for obj_name, deps in self._flatten_dependencies(self.dependencies).items():
+            for dep in deps:
+                graph.add_edge(dep, obj_name)
+
+        return graph
+
+    def _flatten_dependencies(self, dependencies):
+        # {zone: {subzone: {name: [deps]}}} -> {zone_subzone_name: {deps}}
+        flattened = {}
+
         def add_dependencies(dependencies, prefix=''):
             for key, value in dependencies.items():
                 current_prefix = f"{prefix}_{key}" if prefix else key
                 if isinstance(value, dict):
                     add_dependencies(value, current_prefix)
                 else:
-                    for dep in value:
-                        if not graph.has_edge(dep, current_prefix):
-                            graph.add_edge(dep, current_prefix)
+                    flattened.setdefault(current_prefix, set()).update(value)
 
-        add_dependencies(self.dependencies)
+        add_dependencies(dependencies)
+        return flattened
 
-        return graph
+    def refresh(self, file_paths):
+        # Re-read the changed files and update the edges of the affected objects
+        # only; returns the ids of the objects whose files changed
+        file_paths = set(file_paths)
+        self.catalog.refresh(file_paths)
+        if self.deps_file in file_paths:
+            self._load()
+            return set(self.dag_objects)
+
+        previous_objects = self.dag_objects
+        self.dag_objects = self._find_dag_objects()
+        self._auto_deps.refresh(file_paths)
+        # Schema and config files share the prefix of the object they belong to
+        changed_prefixes = {_path_prefix(file_path) for file_path in file_paths}
+        changed = {obj_id for obj_id, (_, file_path) in {**previous_objects, **self.dag_objects}.items()
+                   if _path_prefix(file_path) in changed_prefixes}
+        added = set(self.dag_objects) - set(previous_objects)
+        removed = set(previous_objects) - set(self.dag_objects)
+
+        graph = self.get_graph()
+        for obj_id in removed:
+            graph.remove_node(obj_id)
+            # Objects listed in deps.yaml stay in the graph even without files,
+            # with their edges in both directions
+            for dependent, deps in self.manual_deps.items():
+                if obj_id in deps:
+                    graph.add_edge(obj_id, dependent)
+            for dep_id in self.manual_deps.get(obj_id, ()):
+                graph.add_edge(dep_id, obj_id)
+        for obj_id in added:
+            graph.add_node(obj_id)
+            changed.update(self._auto_deps.get_referencing(obj_id))
+
+        for obj_id in changed - removed:
+            new_deps = self.manual_deps.get(obj_id, set()) | set(self._auto_deps.get_references(obj_id))
+            current_deps = set(graph.predecessors(obj_id)) if obj_id in graph else set()
+            for dep_id in current_deps - new_deps:
+                graph.remove_edge(dep_id, obj_id)
+            for dep_id in new_deps - current_deps:
+                graph.add_edge(dep_id, obj_id)
+
+        self.auto_deps = self._auto_deps.get_dag()
+        # Keep the identifiers of the queries for the next run
+        self.catalog.save()
+        self._levels = None
+        self.get_levels()
+        return changed - removed
+
+    def get_graph(self):
+        if self._graph is None:
+            self._graph = self._build_dependency_graph()
+        return self._graph
+
+    def get_levels(self):
+        # Objects on the same level do not depend on each other
+        if self._levels is None:
+            self._levels = get_levels(self.get_graph())
+        return self._levels
 
     def get_execution_order(self):
-        graph = self._build_dependency_graph()
-        try:
-            # Sort nodes by topological order and then alphabetically
-            return sorted(nx.topological_sort(graph), key=lambda x: (len(nx.ancestors(graph, x)), x))
-        except nx.NetworkXUnfeasible as e:
-            raise ValueError("Cycle detected in dependencies") from e
+        # Sort nodes by depth level and then alphabetically
+        return [obj_id for level in self.get_levels() for obj_id in level]
+
+    def get_dependencies(self, object_ids=None):
+        graph = self.get_graph()
+        if object_ids is None:
+            return {obj_id: set(graph.predecessors(obj_id)) for obj_id in graph.nodes}
+        # Keep the ordering through objects that were left out of the selection
+        return get_nearest_dependencies(graph, self.get_execution_order(), set(object_ids))
+
+    def get_upstream(self, object_ids):
+        return self._traverse(object_ids, self.get_graph().predecessors)
+
+    def get_downstream(self, object_ids):
+        return self._traverse(object_ids, self.get_graph().successors)
+
+    def _traverse(self, object_ids, neighbors):
+        # Objects reachable from object_ids, including themselves
+        reached = set(object_ids)
+        stack = list(reached)
+        while stack:
+            for neighbor in neighbors(stack.pop()):
+                if neighbor not in reached:
+                    reached.add(neighbor)
+                    stack.append(neighbor)
+        return reached
 
     def get_type(self, object_id):
         return self.dag_objects.get(object_id, (None,))[0]
 
+    def get_folder(self, object_id):
+        # Folder of the object relative to the DAG, such as financial/trusted
+        file_path = self.dag_objects.get(object_id, (None, None))[1]
+        if file_path:
+            return os.path.relpath(os.path.dirname(file_path), self.dag_folder).replace(os.sep, '/')
+        return None
+
+    def get_zone(self, object_id):
+        folder = self.get_folder(object_id)
+        return folder.split('/')[0] if folder else None
+
     def get_path_prefix(self, object_id):
         file_path = self.dag_objects.get(object_id, (None, None))[1]
         if file_path:
-            # Extract everything before the first dot in the file name
-            base_name = os.path.basename(file_path)
-            prefix = base_name.split('.')[0]
-            return os.path.join(os.path.dirname(file_path), prefix)
+            return _path_prefix(file_path)
         return None
\ No newline at end of file
@@ -0,0 +1,90 @@
+import heapq
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class ParallelExecutor:
+    def __init__(self, jobs, limits=None):
+        if jobs < 1:
+            raise ValueError("The number of jobs must be at least 1")
+        # limits: group -> number of its tasks that may run at the same time
+        self.jobs = jobs
+        self.limits = limits or {}
+
+    def run(self, tasks, dependencies, worker, priority=None, groups=None):
+        # tasks: ids in execution order; dependencies: id -> ids it waits for;
+        # priority: id -> number, higher first; groups: id -> groups it belongs to
+        tasks = list(tasks)
+        task_set = set(tasks)
+        pending = {task: set(dependencies.get(task, ())) & task_set for task in tasks}
+        dependents = {task: [] for task in tasks}
+        for task, deps in pending.items():
+            for dep in deps:
+                dependents[dep].append(task)
+        position = {task: index for index, task in enumerate(tasks)}
+        task_groups = {task: [group for group in (groups(task) if groups else ()) if group in self.limits] for task in tasks}
+        group_running = {group: 0 for group in self.limits}
+
+        completed = []
+        failed = {}
+        cancelled = []
+
+        def cancel_dependents(task):
+            stack = list(dependents[task])
+            while stack:
+                current = stack.pop()
+                if current in pending:
+                    del pending[current]
+                    cancelled.append(current)
+                    stack.extend(dependents[current])
+
+        def make_ready(task):
+            # Highest priority first, then execution order
+            rank = -priority(task) if priority else 0
+            heapq.heappush(ready, (rank, position[task], task))
+
+        def fits(task):
+            return all(group_running[group] < self.limits[group] for group in task_groups[task])
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            running = {}
+            ready = []
+            for task in tasks:
+                if not pending[task]:
+                    make_ready(task)
+
+            def submit_ready():
+                blocked = []
+                while ready and len(running) < self.jobs:
+                    entry = heapq.heappop(ready)
+                    task = entry[2]
+                    if not fits(task):
+                        blocked.append(entry)
+                        continue
+                    del pending[task]
+                    for group in task_groups[task]:
+                        group_running[group] += 1
+                    running[pool.submit(worker, task)] = task
+                for entry in blocked:
+                    heapq.heappush(ready, entry)
+
+            submit_ready()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    for group in task_groups[task]:
+                        group_running[group] -= 1
+                    error = future.exception()
+                    if error is not None:
+                        failed[task] = error
+                        cancel_dependents(task)
+                        continue
+                    completed.append(task)
+                    for dependent in dependents[task]:
+                        if dependent in pending:
+                            pending[dependent].discard(task)
+                            if not pending[dependent]:
+                                make_ready(dependent)
+                submit_ready()
+
+        return completed, failed, cancelled
@@ -0,0 +1,53 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .bigquery_runner import BigQueryRunner
+from .catalog import Catalog
+from .dag import Dag
+from .templates import load_engine
+
+
+def read_datasets_file(datasets_file):
+    # One dataset per line; blank lines and lines starting with # are ignored
+    with open(datasets_file, 'r') as file:
+        lines = [line.strip() for line in file]
+    return [line for line in lines if line and not line.startswith('#')]
+
+
+def create_runners(project_id, dag_folder, dataset_names, jobs=1, cache_file=None, **kwargs):
+    # The DAG is scanned and the templates compiled once for every dataset
+    dag = Dag(dag_folder, catalog=Catalog(dag_folder, cache_file=cache_file))
+    dag.get_levels()
+    templates = load_engine(dag_folder, dag.catalog)
+    if len(dataset_names) == 1:
+        return [BigQueryRunner(project_id, dataset_names[0], dag_folder, dag=dag, templates=templates, **kwargs)]
+    slots = threading.Semaphore(jobs)
+    return [BigQueryRunner(project_id, dataset_name, dag_folder, dag=dag, templates=templates, slots=slots,
+                           output_prefix=f"[{dataset_name}] ", **kwargs)
+            for dataset_name in dataset_names]
+
+
+def run_datasets(runners, **kwargs):
+    # Every dataset runs at the same time, within the slots the runners share;
+    # returns dataset -> error for the datasets that failed
+    failures = {}
+
+    def run(runner):
+        try:
+            runner.run_commands(**kwargs)
+        except (ValueError, RuntimeError) as e:
+            failures[runner.dataset_name] = e
+
+    with ThreadPoolExecutor(max_workers=len(runners)) as pool:
+        list(pool.map(run, runners))
+    return failures
+
+
+def print_failures(runners, failures):
+    for runner in runners:
+        error = failures.get(runner.dataset_name)
+        if error is None:
+            print(f"dataset {runner.dataset_name}: ok")
+        else:
+            print(f"dataset {runner.dataset_name}: failed")
+            for line in str(error).splitlines():
+                print(f"  {line}")
@@ -0,0 +1,103 @@
+import re
+import yaml
+
+STRATEGIES = ('append', 'merge')
+
+
+def load_config(content, config_file):
+    config = yaml.safe_load(content) or {}
+    if not config.get('watermark'):
+        raise ValueError(f"Missing watermark column in {config_file}")
+    strategy = config.setdefault('strategy', 'append')
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown incremental strategy '{strategy}' in {config_file}")
+    if strategy == 'merge' and not config.get('unique_key'):
+        raise ValueError(f"The merge strategy requires a unique_key in {config_file}")
+    return config
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+
+def _increment(query, watermark, current):
+    # Rows of the query past the current watermark, all of them while the table is empty
+    return (
+        f"SELECT * FROM (\n{query}\n)\n"
+        f"WHERE {current} IS NULL\n"
+        f"OR {watermark} > {current}"
+    )
+
+
+def increment_query(project_id, dataset_name, obj_id, query, config):
+    # The increment as a single query, which can be dry run once the table exists
+    table = f"`{project_id}.{dataset_name}.{obj_id}`"
+    watermark = config['watermark']
+    return _increment(query.strip().rstrip(';'), watermark, f"(SELECT MAX({watermark}) FROM {table})")
+
+
+def build_script(project_id, dataset_name, obj_id, query, config):
+    # The first run creates the table with the full query; later runs only
+    # process the rows past the current watermark of the table
+    table = f"`{project_id}.{dataset_name}.{obj_id}`"
+    query = query.strip().rstrip(';')
+    watermark = config['watermark']
+    partition_by = config.get('partition_by')
+
+    create_options = ''
+    if partition_by:
+        create_options += f"\nPARTITION BY {partition_by}"
+    cluster_by = _as_list(config.get('cluster_by'))
+    if cluster_by:
+        create_options += f"\nCLUSTER BY {', '.join(cluster_by)}"
+
+    # The watermark is read into a variable first, so the filter is a constant
+    # that lets BigQuery prune the partitions of the sources
+    declare = f"DECLARE _bigdag_watermark DEFAULT (SELECT MAX({watermark}) FROM {table});\n"
+    increment = _increment(query, watermark, '_bigdag_watermark')
+
+    if config['strategy'] == 'merge':
+        keys = _as_list(config['unique_key'])
+        if len(keys) == 1:
+            key_match = f"target.{keys[0]} IN (SELECT {keys[0]} FROM _bigdag_increment)"
+        else:
+            target_keys = ', '.join(f"target.{key}" for key in keys)
+            key_match = f"({target_keys}) IN (SELECT ({', '.join(keys)}) FROM _bigdag_increment)"
+        delete_match = key_match
+        partitions = ''
+        if partition_by and not re.search(rf"\b{re.escape(watermark)}\b", partition_by):
+            # Old versions are only looked for in the partitions the increment
+            # writes to; a table partitioned on the watermark moves rows between
+            # partitions, so there every partition is searched
+            partitions = (
+                f"DECLARE _bigdag_partitions DEFAULT (SELECT ARRAY_AGG(DISTINCT {partition_by} IGNORE NULLS) FROM _bigdag_increment);\n"
+            )
+            delete_match = f"({partition_by} IN UNNEST(_bigdag_partitions) OR {partition_by} IS NULL) AND {key_match}"
+        # Rows whose key arrives again are replaced by the new version
+        merge = (
+            f"MERGE {table} AS target\n"
+            f"USING _bigdag_increment AS source\n"
+            f"ON FALSE\n"
+            f"WHEN NOT MATCHED BY SOURCE AND {delete_match} THEN DELETE\n"
+            f"WHEN NOT MATCHED THEN INSERT ROW;"
+        )
+        if partitions:
+            # Variables are declared at the start of a block
+            merge = f"BEGIN\n{partitions}{merge}\nEND;"
+        update = f"{declare}CREATE TEMP TABLE _bigdag_increment AS\n{increment};\n{merge}"
+    else:
+        update = f"{declare}INSERT INTO {table}\n{increment};"
+
+    return (
+        f"IF NOT EXISTS (SELECT 1 FROM `{project_id}.{dataset_name}`.INFORMATION_SCHEMA.TABLES WHERE table_name = '{obj_id}') THEN\n"
+        f"CREATE TABLE {table}{create_options}\nAS\n{query};\n"
+        f"ELSE\n"
+        f"BEGIN\n"
+        f"{update}\n"
+        f"END;\n"
+        f"END IF;"
+    )
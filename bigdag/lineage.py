@@ -0,0 +1,190 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from bigdag.dag import find_dag_objects
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<comment>--[^\n]*|\#[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+  | (?P<quoted>`[^`]*`)
+  | (?P<word>[A-Za-z_][A-Za-z_0-9]*)
+  | (?P<symbol>[.*,()])
+""", re.VERBOSE | re.DOTALL)
+
+# Words that are never columns. Date parts and type names are left out, since
+# columns are often called date or year; an extra column is harmless, a missing one is not
+KEYWORDS = {
+    'all', 'and', 'any', 'array', 'as', 'asc', 'at', 'between', 'by', 'case', 'cast', 'cross', 'current_date',
+    'current_datetime', 'current_time', 'current_timestamp', 'desc', 'distinct', 'else', 'end', 'except', 'exists',
+    'false', 'following', 'for', 'from', 'full', 'group', 'having', 'if', 'ignore', 'in', 'inner', 'intersect',
+    'interval', 'is', 'join', 'left', 'like', 'limit', 'natural', 'not', 'null', 'nulls', 'offset', 'on', 'or', 'order',
+    'outer', 'over', 'partition', 'preceding', 'qualify', 'range', 'recursive', 'replace', 'respect', 'right', 'rows',
+    'select', 'struct', 'then', 'true', 'unbounded', 'union', 'unnest', 'using', 'when', 'where', 'window', 'with',
+}
+
+SQL_TYPES = ('view', 'table', 'incremental')
+
+
+def _tokenize(query):
+    # Names as lists of parts, such as ['p', 'd', 'orders'] for `p.d`.orders,
+    # and symbols as strings
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(query):
+        kind = match.lastgroup
+        text = match.group()
+        if kind in ('comment', 'string'):
+            if kind == 'string':
+                tokens.append("'")
+            continue
+        if kind in ('word', 'quoted'):
+            parts = text.strip('`').split('.')
+            if len(tokens) >= 2 and tokens[-1] == '.' and isinstance(tokens[-2], list):
+                # Continue a dotted name
+                tokens.pop()
+                tokens[-1] = tokens[-1] + parts
+            else:
+                tokens.append(parts)
+        else:
+            tokens.append(text)
+    return tokens
+
+
+def extract_columns(query, object_ids):
+    # {(source object, column)} the query may read. '*' stands for every column;
+    # columns that cannot be tied to one source are attributed to all of them
+    tokens = _tokenize(query)
+
+    def word(index):
+        token = tokens[index] if 0 <= index < len(tokens) else None
+        return token[0].lower() if isinstance(token, list) and len(token) == 1 else None
+
+    def symbol(index):
+        return tokens[index] if 0 <= index < len(tokens) and not isinstance(tokens[index], list) else None
+
+    sources = set()
+    qualifiers = {}
+    ctes = set()
+    for index, token in enumerate(tokens):
+        if not isinstance(token, list):
+            continue
+        if token[-1] in object_ids:
+            sources.add(token[-1])
+            qualifiers[token[-1]] = token[-1]
+            # FROM table alias, FROM table AS alias
+            alias_index = index + 2 if word(index + 1) == 'as' else index + 1
+            alias = word(alias_index)
+            if alias and alias not in KEYWORDS:
+                qualifiers[tokens[alias_index][0]] = token[-1]
+        elif word(index + 1) == 'as' and symbol(index + 2) == '(':
+            # WITH name AS (...)
+            ctes.add(token[0])
+
+    columns = set()
+    for index, token in enumerate(tokens):
+        if token == '*':
+            if symbol(index - 1) == '.':
+                qualifier = tokens[index - 2][-1] if isinstance(tokens[index - 2], list) else None
+                targets = [qualifiers[qualifier]] if qualifier in qualifiers else sources
+                columns.update((source, '*') for source in targets)
+            elif word(index - 1) in ('select', 'distinct') or symbol(index - 1) == ',':
+                columns.update((source, '*') for source in sources)
+            continue
+        if not isinstance(token, list) or token[-1] in object_ids:
+            continue
+        if len(token) >= 2:
+            # qualifier.column; subquery and UNNEST aliases are not known sources
+            targets = [qualifiers[token[-2]]] if token[-2] in qualifiers else sources
+            columns.update((source, token[-1]) for source in targets)
+            continue
+        name = token[0]
+        if name.lower() in KEYWORDS or name in qualifiers or name in ctes:
+            continue
+        if symbol(index + 1) == '(' or word(index - 1) == 'as':
+            # Functions and output aliases
+            continue
+        columns.update((source, name) for source in sources)
+
+    # Sources with no column found are taken as read entirely
+    for source in sources - {source for source, _ in columns}:
+        columns.add((source, '*'))
+    return columns
+
+
+class LineageIndex:
+    """Columns each object reads from its sources, kept in SQLite and updated as files change."""
+
+    def __init__(self, index_file):
+        self.index_file = index_file
+        folder = os.path.dirname(index_file)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(index_file, check_same_thread=False)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, object_id TEXT, hash TEXT);
+            CREATE TABLE IF NOT EXISTS reads (object_id TEXT, source_id TEXT, column_name TEXT);
+            CREATE INDEX IF NOT EXISTS reads_source ON reads (source_id, column_name);
+            CREATE INDEX IF NOT EXISTS reads_object ON reads (object_id);
+        """)
+
+    def close(self):
+        self.connection.close()
+
+    def update(self, dag_folder, catalog):
+        # Parse only the files whose content changed; a new or removed object
+        # may change what any query refers to, so it parses everything again
+        dag_objects = find_dag_objects(dag_folder, catalog.entries)
+        object_ids = set(dag_objects)
+        objects_hash = hashlib.sha256('\n'.join(sorted(object_ids)).encode()).hexdigest()
+        sql_files = {file_path: obj_id for obj_id, (obj_type, file_path) in dag_objects.items() if obj_type in SQL_TYPES}
+
+        with self._lock, self.connection:
+            cursor = self.connection.cursor()
+            row = cursor.execute("SELECT value FROM meta WHERE key = 'objects'").fetchone()
+            if row is None or row[0] != objects_hash:
+                cursor.execute("DELETE FROM files")
+                cursor.execute("DELETE FROM reads")
+                cursor.execute("INSERT OR REPLACE INTO meta VALUES ('objects', ?)", (objects_hash,))
+            indexed = dict(cursor.execute("SELECT path, hash FROM files"))
+
+            for file_path in set(indexed) - set(sql_files):
+                cursor.execute("DELETE FROM reads WHERE object_id = (SELECT object_id FROM files WHERE path = ?)", (file_path,))
+                cursor.execute("DELETE FROM files WHERE path = ?", (file_path,))
+
+            parsed = 0
+            for file_path, obj_id in sql_files.items():
+                content = catalog.read(file_path)
+                content_hash = hashlib.sha256(content.encode()).hexdigest()
+                if indexed.get(file_path) == content_hash:
+                    continue
+                reads = extract_columns(content, object_ids - {obj_id})
+                cursor.execute("DELETE FROM reads WHERE object_id = ?", (obj_id,))
+                cursor.executemany("INSERT INTO reads VALUES (?, ?, ?)", [(obj_id, source, column.lower()) for source, column in reads])
+                cursor.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", (file_path, obj_id, content_hash))
+                parsed += 1
+        return parsed
+
+    def get_readers(self, source_id, column):
+        # Column names are case insensitive, as in BigQuery
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT DISTINCT object_id FROM reads WHERE source_id = ? AND column_name IN (?, '*') ORDER BY object_id",
+                (source_id, column.lower())
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_impact(self, source_id, column):
+        # Objects reading the column, then the objects reading a column of the
+        # same name from those, which is how it usually flows downstream
+        impact = {}
+        queue = [(source_id, 0)]
+        while queue:
+            current, depth = queue.pop(0)
+            for reader in self.get_readers(current, column):
+                if reader not in impact and reader != source_id:
+                    impact[reader] = (depth + 1, current)
+                    queue.append((reader, depth + 1))
+        return impact
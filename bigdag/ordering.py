@@ -0,0 +1,37 @@
+def get_levels(graph):
+    # Kahn's algorithm one level at a time: a node lands on the level after
+    # its deepest dependency, and ties within a level are sorted by name
+    in_degree = {node: degree for node, degree in graph.in_degree()}
+    current = sorted(node for node, degree in in_degree.items() if degree == 0)
+    levels = []
+    visited = 0
+
+    while current:
+        levels.append(current)
+        visited += len(current)
+        next_level = []
+        for node in current:
+            for successor in graph.successors(node):
+                in_degree[successor] -= 1
+                if in_degree[successor] == 0:
+                    next_level.append(successor)
+        current = sorted(next_level)
+
+    if visited != len(in_degree):
+        raise ValueError("Cycle detected in dependencies")
+    return levels
+
+
+def get_nearest_dependencies(graph, execution_order, selected):
+    # For each selected node, the closest selected nodes upstream of it,
+    # looking through the nodes that were left out of the selection
+    nearest = {}
+    for node in execution_order:
+        dependencies = set()
+        for predecessor in graph.predecessors(node):
+            if predecessor in selected:
+                dependencies.add(predecessor)
+            else:
+                dependencies |= nearest[predecessor]
+        nearest[node] = dependencies
+    return {node: nearest[node] for node in selected if node in nearest}
@@ -0,0 +1,70 @@
+import threading
+import time
+
+
+class ProgressView:
+    """Listener printing the running, queued and done objects every few seconds of a run."""
+
+    def __init__(self, interval=5.0, top=5, clock=time.time, prefix=''):
+        self.interval = interval
+        # Put before each line, to tell datasets deployed at the same time apart
+        self.prefix = prefix
+        # Running objects listed on each line, the longest running first
+        self.top = top
+        self.clock = clock
+        self.total = 0
+        self.running = {}
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0
+        self.run_start = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __call__(self, event):
+        with self._lock:
+            if event['event'] == 'run_start':
+                self.total = event['objects']
+                self.running, self.done, self.failed, self.skipped = {}, 0, 0, 0
+                self.run_start = event['ts']
+            elif event['event'] == 'object_start':
+                self.running[event['object_id']] = event['ts']
+            elif event['event'] == 'object_end':
+                self.running.pop(event['object_id'], None)
+                self.done += 1
+                if event['status'] != 'ok':
+                    self.failed += 1
+            elif event['event'] == 'object_skipped' and event['status'] == 'skipped':
+                self.skipped += 1
+
+        if event['event'] == 'run_start':
+            self._start()
+        elif event['event'] == 'run_end':
+            self._stop.set()
+            if self._thread is not None:
+                self._thread.join()
+                self._thread = None
+
+    def _start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            print(self.render(), flush=True)
+
+    def render(self):
+        with self._lock:
+            now = self.clock()
+            queued = self.total - len(self.running) - self.done - self.skipped
+            line = f"{self.prefix}progress {now - self.run_start:.0f}s: {len(self.running)} running, {queued} queued, {self.done} done"
+            if self.failed:
+                line += f" ({self.failed} failed)"
+            if self.skipped:
+                line += f", {self.skipped} skipped"
+            running = sorted(self.running.items(), key=lambda item: (item[1], item[0]))[:self.top]
+            if running:
+                line += " | " + ', '.join(f"{obj_id} {now - start:.0f}s" for obj_id, start in running)
+            return line
@@ -0,0 +1,58 @@
+import json
+
+# Legacy type names of schema files -> names reported by INFORMATION_SCHEMA
+STANDARD_TYPES = {
+    'INTEGER': 'INT64',
+    'FLOAT': 'FLOAT64',
+    'BOOLEAN': 'BOOL',
+}
+
+
+def _normalize_query(query):
+    return (query or '').strip().rstrip(';').strip()
+
+
+def view_matches(query, metadata):
+    # The stored view query is the text it was created with
+    return metadata['type'] == 'VIEW' and _normalize_query(metadata['view_query']) == _normalize_query(query)
+
+
+def _expected_columns(schema):
+    if isinstance(schema, dict):
+        schema = schema.get('fields', [])
+    columns = []
+    for field in schema:
+        data_type = field.get('type', 'STRING').upper()
+        data_type = STANDARD_TYPES.get(data_type, data_type)
+        mode = field.get('mode', 'NULLABLE').upper()
+        if mode == 'REPEATED':
+            data_type = f"ARRAY<{data_type}>"
+        columns.append((field['name'], data_type, 'NO' if mode == 'REQUIRED' else 'YES'))
+    return columns
+
+
+def _expected_options(definition):
+    sheets = definition.get('googleSheetsOptions', {})
+    options = {
+        'format': definition.get('sourceFormat'),
+        'uris': definition.get('sourceUris'),
+        'sheet_range': sheets.get('range'),
+        'skip_leading_rows': sheets.get('skipLeadingRows'),
+    }
+    return {name: value for name, value in options.items() if value is not None}
+
+
+def _as_text(value):
+    if isinstance(value, list):
+        return [str(item) for item in value]
+    return str(value)
+
+
+def external_table_matches(schema_content, def_content, metadata):
+    if metadata['type'] != 'EXTERNAL':
+        return False
+    # Nested fields are reported as STRUCT<...>, so they are always redeployed
+    if metadata['columns'] != _expected_columns(json.loads(schema_content)):
+        return False
+    options = metadata['options']
+    return all(_as_text(options.get(name)) == _as_text(value) for name, value in _expected_options(json.loads(def_content)).items())
@@ -0,0 +1,40 @@
+def parse_limits(values):
+    # zone=N or zone/subzone=N, as given on the command line
+    limits = {}
+    for value in values:
+        group, _, limit = value.partition('=')
+        group = group.strip().strip('/')
+        if not group or not limit.strip().isdigit() or int(limit) < 1:
+            raise ValueError(f"Invalid zone limit '{value}', expected zone=N or zone/subzone=N")
+        limits[group] = int(limit)
+    return limits
+
+
+def get_groups(folder):
+    # financial/trusted/eu belongs to financial, financial/trusted and financial/trusted/eu
+    if not folder:
+        return []
+    parts = folder.split('/')
+    return ['/'.join(parts[:index + 1]) for index in range(len(parts))]
+
+
+def get_priorities(execution_order, dependencies, durations, default_duration=None):
+    # Longest remaining path to the end of the run, so the objects that hold
+    # the most work behind them start first
+    if default_duration is None:
+        known = [durations[obj_id] for obj_id in execution_order if durations.get(obj_id) is not None]
+        default_duration = sum(known) / len(known) if known else 1.0
+
+    dependents = {obj_id: [] for obj_id in execution_order}
+    for obj_id in execution_order:
+        for dep_id in dependencies.get(obj_id, ()):
+            if dep_id in dependents:
+                dependents[dep_id].append(obj_id)
+
+    priorities = {}
+    for obj_id in reversed(execution_order):
+        duration = durations.get(obj_id)
+        if duration is None:
+            duration = default_duration
+        priorities[obj_id] = duration + max((priorities[dependent] for dependent in dependents[obj_id]), default=0)
+    return priorities
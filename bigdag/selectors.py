@@ -0,0 +1,45 @@
+import fnmatch
+import os
+
+GLOB_CHARACTERS = '*?['
+
+
+def select_objects(dag, selectors):
+    # Selectors: exact ids, globs (financial_raw_*), path:<folder>, type:<type>,
+    # with a leading + to add upstream objects and a trailing + for downstream ones
+    selected = set()
+    for selector in selectors:
+        upstream = selector.startswith('+')
+        downstream = selector.endswith('+') and len(selector) > 1
+        pattern = selector[1 if upstream else 0:len(selector) - 1 if downstream else len(selector)]
+
+        matched = _match(dag, pattern)
+        if not matched:
+            raise ValueError(f"No objects match selector: {selector}")
+        selected |= matched
+        if upstream:
+            selected |= dag.get_upstream(matched)
+        if downstream:
+            selected |= dag.get_downstream(matched)
+    return selected
+
+
+def _match(dag, pattern):
+    graph = dag.get_graph()
+    if pattern.startswith('path:'):
+        folder = os.path.normpath(pattern[len('path:'):])
+        return {obj_id for obj_id in graph if _in_folder(dag, obj_id, folder)}
+    if pattern.startswith('type:'):
+        obj_type = pattern[len('type:'):]
+        return {obj_id for obj_id in graph if dag.get_type(obj_id) == obj_type}
+    if any(character in pattern for character in GLOB_CHARACTERS):
+        return set(fnmatch.filter(graph.nodes, pattern))
+    return {pattern} if pattern in graph else set()
+
+
+def _in_folder(dag, obj_id, folder):
+    path_prefix = dag.get_path_prefix(obj_id)
+    if path_prefix is None:
+        return False
+    relative_path = os.path.relpath(path_prefix, dag.dag_folder)
+    return relative_path == folder or relative_path.startswith(folder + os.sep)
@@ -0,0 +1,202 @@
+import json
+import os
+import threading
+
+
+def _load_json(json_file):
+    if not os.path.exists(json_file):
+        return {}
+    with open(json_file, 'r') as file:
+        return json.load(file)
+
+
+# One lock per file, for runners of several datasets sharing it
+_file_locks = {}
+_file_locks_lock = threading.Lock()
+
+
+def _file_lock(json_file):
+    with _file_locks_lock:
+        return _file_locks.setdefault(os.path.abspath(json_file), threading.Lock())
+
+
+def _update_json(json_file, key, value):
+    # Rewrite only the entry of one key, keeping the entries other runners saved
+    with _file_lock(json_file):
+        data = _load_json(json_file)
+        if value is None:
+            data.pop(key, None)
+        else:
+            data[key] = value
+        if data:
+            _save_json(json_file, data)
+        elif os.path.exists(json_file):
+            os.remove(json_file)
+
+
+def _save_json(json_file, data):
+    folder = os.path.dirname(json_file)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp_file = f"{json_file}.tmp"
+    with open(tmp_file, 'w') as file:
+        json.dump(data, file, indent=2, sort_keys=True)
+    os.replace(tmp_file, json_file)
+
+
+def _load_json_lines(json_file, key):
+    # Records of one key, in the order they were appended; a line cut short by
+    # a killed process is skipped
+    if not os.path.exists(json_file):
+        return []
+    records = []
+    with _file_lock(json_file), open(json_file, 'r') as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and record.get('key') == key:
+                records.append(record)
+    return records
+
+
+def _append_json_line(json_file, record):
+    # Appending costs the same however many datasets share the file
+    with _file_lock(json_file):
+        folder = os.path.dirname(json_file)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(json_file, 'a') as file:
+            file.write(json.dumps(record, sort_keys=True) + '\n')
+
+
+def _replace_json_lines(json_file, key, record=None):
+    # Rewrite the file without the records of one key, and with record instead
+    with _file_lock(json_file):
+        if not os.path.exists(json_file):
+            lines = []
+        else:
+            with open(json_file, 'r') as file:
+                lines = file.readlines()
+        kept = []
+        for line in lines:
+            try:
+                current = json.loads(line)
+            except ValueError:
+                continue
+            if not (isinstance(current, dict) and current.get('key') == key):
+                kept.append(line)
+        if record is not None:
+            kept.append(json.dumps(record, sort_keys=True) + '\n')
+        if not kept:
+            if os.path.exists(json_file):
+                os.remove(json_file)
+            return
+        tmp_file = f"{json_file}.tmp"
+        with open(tmp_file, 'w') as file:
+            file.writelines(kept)
+        os.replace(tmp_file, json_file)
+
+
+class BuildState:
+    """Content hashes of the objects last built into each dataset."""
+
+    def __init__(self, state_file, key):
+        self.state_file = state_file
+        self.key = key
+        self._lock = threading.Lock()
+        self.hashes = _load_json(state_file).get(key, {})
+
+    def get(self, object_id):
+        return self.hashes.get(object_id)
+
+    def set(self, object_id, content_hash):
+        with self._lock:
+            self.hashes[object_id] = content_hash
+
+    def save(self):
+        with self._lock:
+            _update_json(self.state_file, self.key, dict(self.hashes))
+
+
+class Checkpoint:
+    """Objects completed by the current run of each dataset, to resume it after a failure."""
+
+    def __init__(self, checkpoint_file, key):
+        # One JSON line per completed object, so saving does not rewrite the
+        # records of the other datasets sharing the file
+        self.checkpoint_file = checkpoint_file
+        self.key = key
+        self._lock = threading.Lock()
+        self.completed = set()
+        self.dataset_created = False
+        for record in _load_json_lines(checkpoint_file, key):
+            if 'completed' in record:
+                self.completed.add(record['completed'])
+            if record.get('dataset_created'):
+                self.dataset_created = True
+
+    def mark_dataset_created(self):
+        with self._lock:
+            self.dataset_created = True
+            _append_json_line(self.checkpoint_file, {'key': self.key, 'dataset_created': True})
+
+    def mark_completed(self, object_id):
+        # Saved right away, so the progress survives the process being killed
+        with self._lock:
+            self.completed.add(object_id)
+            _append_json_line(self.checkpoint_file, {'key': self.key, 'completed': object_id})
+
+    def clear(self):
+        with self._lock:
+            had_records = bool(self.completed or self.dataset_created)
+            self.completed = set()
+            self.dataset_created = False
+            if had_records:
+                _replace_json_lines(self.checkpoint_file, self.key)
+
+
+class DurationHistory:
+    """Average build duration of each object, kept up to date from the run events."""
+
+    # Appended records of a dataset merged back into one past this number
+    compact_after = 20
+
+    def __init__(self, history_file, key, weight=0.5):
+        # One JSON line per run with the averages it updated, later lines taking precedence
+        self.history_file = history_file
+        self.key = key
+        # Weight of the latest run in the moving average
+        self.weight = weight
+        self._lock = threading.Lock()
+        self.durations = {}
+        records = _load_json_lines(history_file, key)
+        for record in records:
+            self.durations.update(record.get('durations', {}))
+        self._records = len(records)
+        self._updated = {}
+
+    def get(self, object_id):
+        return self.durations.get(object_id)
+
+    def __call__(self, event):
+        if event['event'] == 'object_end' and event['status'] == 'ok':
+            with self._lock:
+                previous = self.durations.get(event['object_id'])
+                duration = event['duration']
+                if previous is not None:
+                    duration = self.weight * duration + (1 - self.weight) * previous
+                self.durations[event['object_id']] = duration
+                self._updated[event['object_id']] = duration
+        elif event['event'] == 'run_end':
+            with self._lock:
+                if not self._updated:
+                    return
+                if self._records >= self.compact_after:
+                    _replace_json_lines(self.history_file, self.key, {'key': self.key, 'durations': dict(self.durations)})
+                    self._records = 1
+                else:
+                    _append_json_line(self.history_file, {'key': self.key, 'durations': dict(self._updated)})
+                    self._records += 1
+                self._updated = {}
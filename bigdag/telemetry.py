@@ -0,0 +1,59 @@
+import json
+import os
+import threading
+
+
+class JsonLinesWriter:
+    """Listener appending every run event to a JSON lines file."""
+
+    def __init__(self, events_file):
+        self.events_file = events_file
+        self._lock = threading.Lock()
+        folder = os.path.dirname(events_file)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+    def __call__(self, event):
+        line = json.dumps(event, default=str)
+        with self._lock:
+            with open(self.events_file, 'a') as file:
+                file.write(line + '\n')
+
+
+class RunRecorder:
+    """Listener keeping the last event of each object, for the run report."""
+
+    def __init__(self):
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        if event['event'] in ('object_end', 'object_skipped'):
+            with self._lock:
+                self.objects[event['object_id']] = event
+
+    def get_durations(self):
+        return {obj_id: event['duration'] for obj_id, event in self.objects.items() if event['event'] == 'object_end'}
+
+
+def critical_path(execution_order, dependencies, durations):
+    # Longest chain of dependent objects, weighted by their durations
+    finish = {}
+    previous = {}
+    for obj_id in execution_order:
+        if obj_id not in durations:
+            continue
+        upstream = [dep_id for dep_id in dependencies.get(obj_id, ()) if dep_id in finish]
+        slowest = max(upstream, key=lambda dep_id: finish[dep_id], default=None)
+        finish[obj_id] = durations[obj_id] + (finish[slowest] if slowest else 0)
+        previous[obj_id] = slowest
+
+    if not finish:
+        return [], 0
+    obj_id = max(finish, key=finish.get)
+    total = finish[obj_id]
+    path = []
+    while obj_id:
+        path.append(obj_id)
+        obj_id = previous[obj_id]
+    return list(reversed(path)), total
@@ -0,0 +1,112 @@
+import ast
+import os
+import re
+import threading
+import yaml
+
+VARS_FILE = 'vars.yaml'
+
+PLACEHOLDER_PATTERN = re.compile(r'\{\{(.*?)\}\}', re.DOTALL)
+
+
+def quote(value):
+    # SQL string literal
+    return "'" + str(value).replace('\\', '\\\\').replace("'", "\\'") + "'"
+
+
+def ident(value):
+    # Quoted identifier, such as a table name
+    return '`' + str(value).replace('`', '\\`') + '`'
+
+
+BUILTINS = {'quote': quote, 'ident': ident}
+
+
+class TemplateEngine:
+    """Renders {{variable}} and {{macro(args)}} placeholders, compiling each template once."""
+
+    def __init__(self, variables=None, macros=None):
+        self.variables = dict(variables or {})
+        self.macros = {}
+        for name, macro in (macros or {}).items():
+            if not isinstance(macro, dict) or 'sql' not in macro:
+                raise ValueError(f"Macro '{name}' must have a sql template")
+            self.macros[name] = (list(macro.get('args', [])), macro['sql'])
+        # Content -> compiled template, shared by every dataset rendered with the engine;
+        # the catalog hands out the same string for a file, whose hash Python keeps
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def compile(self, content):
+        compiled = self._compiled.get(content)
+        if compiled is None:
+            compiled = self._compile(content)
+            with self._lock:
+                self._compiled[content] = compiled
+        return compiled
+
+    def _compile(self, content):
+        # Literal text and parsed expressions, alternating
+        parts = []
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(content):
+            parts.append(content[position:match.start()])
+            parts.append(self._parse(match.group(1).strip()))
+            position = match.end()
+        parts.append(content[position:])
+        return parts
+
+    def _parse(self, expression):
+        try:
+            node = ast.parse(expression, mode='eval').body
+        except SyntaxError:
+            raise ValueError(f"Invalid template expression: {{{{{expression}}}}}")
+        if isinstance(node, ast.Name):
+            return node
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords \
+                and all(isinstance(arg, (ast.Name, ast.Constant)) for arg in node.args):
+            return node
+        raise ValueError(f"Unsupported template expression: {{{{{expression}}}}}")
+
+    def render(self, content, context=None, depth=0):
+        compiled = self.compile(content)
+        if len(compiled) == 1:
+            return compiled[0]
+        context = dict(self.variables, **(context or {}))
+        rendered = []
+        for index, part in enumerate(compiled):
+            rendered.append(part if index % 2 == 0 else self._evaluate(part, context, depth))
+        return ''.join(rendered)
+
+    def _value(self, node, context):
+        if isinstance(node, ast.Constant):
+            return node.value
+        if node.id not in context:
+            raise ValueError(f"Unknown template variable: {node.id}")
+        return context[node.id]
+
+    def _evaluate(self, node, context, depth):
+        if isinstance(node, ast.Name):
+            return str(self._value(node, context))
+        name = node.func.id
+        args = [self._value(arg, context) for arg in node.args]
+        if name in BUILTINS:
+            return BUILTINS[name](*args)
+        if name not in self.macros:
+            raise ValueError(f"Unknown template macro: {name}")
+        if depth > 10:
+            raise ValueError(f"Template macro {name} is nested too deeply")
+        arg_names, sql = self.macros[name]
+        if len(args) != len(arg_names):
+            raise ValueError(f"Template macro {name} takes {len(arg_names)} arguments, got {len(args)}")
+        # Macros see the variables, with their arguments on top
+        return self.render(sql, dict(context, **dict(zip(arg_names, args))), depth + 1)
+
+
+def load_engine(dag_folder, catalog):
+    # Variables and macros of the DAG, from vars.yaml at its root
+    vars_file = os.path.join(dag_folder, VARS_FILE)
+    if not catalog.exists(vars_file):
+        return TemplateEngine()
+    config = yaml.safe_load(catalog.read(vars_file)) or {}
+    return TemplateEngine(variables=config.get('vars'), macros=config.get('macros'))
@@ -1,3 +1,10 @@
 def readfile(file_path):
     with open(file_path, 'r') as file:
-        return file.read().strip()
\ No newline at end of file
+        return file.read().strip()
+
+def format_bytes(num_bytes):
+    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
+        if abs(num_bytes) < 1024 or unit == 'TB':
+            break
+        num_bytes /= 1024
+    return f"{num_bytes:.2f} {unit}" if unit != 'B' else f"{num_bytes} B"
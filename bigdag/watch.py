@@ -0,0 +1,81 @@
+import os
+import time
+from bigdag.catalog import scan_files
+from bigdag.selectors import select_objects
+from bigdag.templates import VARS_FILE, load_engine
+
+# Objects built from a query, which may use the variables and macros of vars.yaml
+SQL_TYPES = ('view', 'table', 'incremental')
+
+
+class Watcher:
+    """Keeps the DAG in memory and redeploys the objects whose files change."""
+
+    def __init__(self, runner, interval=1.0, debounce=0.5, jobs=1, verbose=False, object_ids=None):
+        self.runner = runner
+        self.interval = interval
+        # Quiet time to wait for, so an editor saving several files triggers one deploy
+        self.debounce = debounce
+        self.jobs = jobs
+        self.verbose = verbose
+        self.object_ids = object_ids
+        self.snapshot = self._snapshot()
+
+    def _snapshot(self):
+        return {os.path.join(root, name): (stat.st_mtime_ns, stat.st_size)
+                for root, name, stat in scan_files(self.runner.dag.dag_folder)}
+
+    def poll(self):
+        # Files added, changed or removed since the last poll
+        snapshot = self._snapshot()
+        changed = {file_path for file_path in snapshot.keys() | self.snapshot.keys()
+                   if snapshot.get(file_path) != self.snapshot.get(file_path)}
+        self.snapshot = snapshot
+        return changed
+
+    def wait_for_changes(self):
+        changed = set()
+        while not changed:
+            time.sleep(self.interval)
+            changed = self.poll()
+        while True:
+            time.sleep(self.debounce)
+            more = self.poll()
+            if not more:
+                return changed
+            changed |= more
+
+    def deploy(self, changed_files):
+        dag = self.runner.dag
+        # Objects deployed before the change, which are replaced rather than created
+        existing = set(dag.dag_objects)
+        affected = dag.refresh(changed_files)
+        if os.path.join(dag.dag_folder, VARS_FILE) in changed_files:
+            # Variables and macros may be used by any query
+            self.runner.templates = load_engine(dag.dag_folder, dag.catalog)
+            affected |= {obj_id for obj_id in dag.dag_objects if dag.get_type(obj_id) in SQL_TYPES}
+        affected &= set(dag.get_graph().nodes)
+        # The changed objects and everything built on top of them
+        object_ids = dag.get_downstream(affected)
+        if self.object_ids:
+            # Selectors are resolved again, since files may have been added or removed
+            object_ids &= select_objects(dag, self.object_ids)
+        object_ids = [obj_id for obj_id in dag.get_execution_order() if obj_id in object_ids]
+        if not object_ids:
+            return []
+        print(f"changes detected, deploying {len(object_ids)} objects")
+        self.runner.run_commands(object_ids=object_ids, verbose=self.verbose, jobs=self.jobs, existing=existing)
+        return object_ids
+
+    def watch(self):
+        print(f"watching {self.runner.dag.dag_folder} for changes, press Ctrl+C to stop")
+        try:
+            while True:
+                changed_files = self.wait_for_changes()
+                try:
+                    self.deploy(changed_files)
+                except (ValueError, RuntimeError) as e:
+                    # Keep watching, the next change may fix it
+                    print(f"Error: {e}")
+        except KeyboardInterrupt:
+            pass
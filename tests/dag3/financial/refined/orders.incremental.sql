@@ -0,0 +1,2 @@
+SELECT order_id, amount, updated_at
+FROM `{{project_id}}.{{dataset}}.financial_raw_orders`;
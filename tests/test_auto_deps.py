@@ -1,3 +1,6 @@
+import os
+import shutil
+import tempfile
 import unittest
 from bigdag.auto_deps import AutoDeps
 
@@ -30,5 +33,30 @@ class TestAutoDeps(unittest.TestCase):
         dependencies = auto_deps.get_dag()
         self.assertEqual(dependencies, expected_dependencies)
 
+    def test_get_dag_matches_whole_identifiers(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        dag_folder = os.path.join(tmp_dir, 'dag')
+        shutil.copytree('tests/dag1', dag_folder)
+        with open(os.path.join(dag_folder, 'financial/raw/sales_eu.sheet.def.json'), 'w') as file:
+            file.write('{}')
+        with open(os.path.join(dag_folder, 'financial/trusted/sales_eu.view.sql'), 'w') as file:
+            file.write('SELECT * FROM `{{project_id}}.{{dataset}}.financial_raw_sales_eu`')
+
+        dependencies = AutoDeps(dag_folder).get_dag()
+
+        self.assertEqual(dependencies['financial']['trusted']['sales_eu'], ['financial_raw_sales_eu'])
+        self.assertEqual(dependencies['financial']['trusted']['sales'], ['financial_raw_sales'])
+
+    def test_get_references_does_not_walk_the_objects(self):
+        class ObjectsDict(dict):
+            def __iter__(self):
+                raise AssertionError('every object of the DAG was walked')
+
+        auto_deps = AutoDeps('tests/dag1')
+        auto_deps.dag_objects = ObjectsDict(auto_deps.dag_objects)
+        self.assertEqual(auto_deps.get_references('financial_trusted_sales'), ['financial_raw_sales'])
+        self.assertEqual(auto_deps.get_references('financial_raw_sales'), [])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,196 @@
+import io
+import os
+import sys
+import tempfile
+import types
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+from bigdag.backends import CLIENT_SCOPES, BackendError, ClientBackend, FakeBackend, ShellBackend, create_backend
+from bigdag.bigquery_runner import BigQueryRunner
+
+class TestFakeBackend(unittest.TestCase):
+
+    def _run(self, backend, **kwargs):
+        runner = BigQueryRunner('test_project', 'test_dataset', 'tests/dag1', backend=backend)
+        with redirect_stdout(io.StringIO()):
+            runner.run_commands(**kwargs)
+
+    def test_records_operations(self):
+        backend = FakeBackend()
+        self._run(backend, recreate=True)
+
+        calls = [(op['action'], op.get('object_id')) for op in backend.calls]
+        self.assertEqual(calls, [
+            ('drop_dataset', None),
+            ('create_dataset', None),
+            ('create_external_table', 'financial_raw_sales'),
+            ('create_view', 'financial_trusted_sales'),
+            ('query_to_table', 'financial_refined_monthly_sales')
+        ])
+        table_query = backend.calls[-1]['query']
+        self.assertIn('`test_project.test_dataset.financial_trusted_sales`', table_query)
+
+    def test_parallel_run_records_operations(self):
+        backend = FakeBackend()
+        self._run(backend, jobs=4)
+
+        self.assertEqual([op['object_id'] for op in backend.calls], [
+            'financial_raw_sales',
+            'financial_trusted_sales',
+            'financial_refined_monthly_sales'
+        ])
+
+    def test_failure_stops_the_run(self):
+        backend = FakeBackend(fail=['financial_trusted_sales'])
+        with self.assertRaises(BackendError):
+            self._run(backend)
+
+        self.assertEqual(len(backend.calls), 2)
+
+    def test_create_backend(self):
+        self.assertIsInstance(create_backend('fake'), FakeBackend)
+        with self.assertRaises(ValueError):
+            create_backend('unknown')
+
+class TestShellBackend(unittest.TestCase):
+
+    def _operation(self, command, **kwargs):
+        return dict({'command': command, 'description': 'test'}, **kwargs)
+
+    def test_output_is_streamed_and_bounded(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_file = os.path.join(tmp_dir, 'object.log')
+            lines = []
+            result = ShellBackend(tail_lines=3).execute(self._operation('seq 1 10', log_file=log_file, on_output=lines.append))
+
+            self.assertEqual(result['output'], '8\n9\n10\n')
+            self.assertEqual(len(lines), 10)
+            with open(log_file) as file:
+                self.assertEqual(file.read(), '$ seq 1 10\n' + ''.join(f"{n}\n" for n in range(1, 11)))
+
+    def test_argv_runs_without_a_shell(self):
+        query = "SELECT '$HOME' AS `quoted`\n" * 20000
+        result = ShellBackend(tail_lines=1).execute(self._operation('cat', argv=['cat'], stdin=query))
+        self.assertEqual(result['output'], "SELECT '$HOME' AS `quoted`\n")
+
+    def test_runner_passes_queries_unquoted(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # A bq stand-in recording its arguments and stdin
+            bq = os.path.join(tmp_dir, 'bq')
+            with open(bq, 'w') as file:
+                file.write('#!/bin/sh\nprintf "%s|" "$@" >> "$BQ_CALLS"\ncat >> "$BQ_CALLS"\necho >> "$BQ_CALLS"\n')
+            os.chmod(bq, 0o755)
+            calls_file = os.path.join(tmp_dir, 'calls')
+            environ = dict(os.environ)
+            os.environ.update(PATH=f"{tmp_dir}{os.pathsep}{os.environ['PATH']}", BQ_CALLS=calls_file)
+            try:
+                runner = BigQueryRunner('test_project', 'test_dataset', 'tests/dag1', backend=ShellBackend())
+                with redirect_stdout(io.StringIO()):
+                    runner.run_commands(object_ids=['financial_refined_monthly_sales'])
+            finally:
+                os.environ.clear()
+                os.environ.update(environ)
+            with open(calls_file) as file:
+                calls = file.read()
+
+        self.assertTrue(calls.startswith('query|--project_id|test_project|--use_legacy_sql=false|--replace|'
+                                         '--destination_table=test_project:test_dataset.financial_refined_monthly_sales|'))
+        self.assertIn('`test_project.test_dataset.financial_trusted_sales`', calls)
+
+    def test_failure_details_come_from_the_output(self):
+        with self.assertRaises(BackendError) as context:
+            ShellBackend().execute(self._operation('echo "Error 503: Service Unavailable" >&2; exit 1'))
+        self.assertIn('Service Unavailable', context.exception.details)
+        self.assertTrue(context.exception.transient)
+
+def stub_client_library():
+    # Just enough of google-cloud-bigquery and google-auth to run ClientBackend offline
+    exceptions = types.ModuleType('google.api_core.exceptions')
+    exceptions.GoogleAPIError = type('GoogleAPIError', (Exception,), {})
+    for name in ('NotFound', 'Conflict', 'TooManyRequests', 'InternalServerError', 'BadGateway', 'ServiceUnavailable', 'GatewayTimeout'):
+        setattr(exceptions, name, type(name, (exceptions.GoogleAPIError,), {}))
+
+    bigquery = types.ModuleType('google.cloud.bigquery')
+    bigquery.Table = lambda table_ref: types.SimpleNamespace(table_ref=table_ref)
+    bigquery.SchemaField = types.SimpleNamespace(from_api_repr=lambda field: (field['name'], field['type']))
+    bigquery.ExternalConfig = types.SimpleNamespace(from_api_repr=dict)
+    bigquery.QueryJobConfig = types.SimpleNamespace
+    bigquery.WriteDisposition = types.SimpleNamespace(WRITE_TRUNCATE='WRITE_TRUNCATE')
+    bigquery.Client = lambda **kwargs: types.SimpleNamespace(**kwargs)
+
+    auth = types.ModuleType('google.auth')
+    auth.default = mock.Mock(return_value=('credentials', 'default_project'))
+    return {'google.api_core.exceptions': exceptions, 'google.cloud.bigquery': bigquery, 'google.auth': auth}
+
+class StubClient:
+
+    def __init__(self, error=None):
+        self.error = error
+        self.tables = []
+        self.queries = []
+
+    def create_table(self, table):
+        if self.error is not None:
+            raise self.error
+        self.tables.append(table)
+
+    def query(self, query, job_config=None, project=None):
+        self.queries.append((query, job_config, project))
+        return types.SimpleNamespace(result=lambda: None, job_id='job_1', total_bytes_processed=10, total_bytes_billed=10,
+                                     slot_millis=5, cache_hit=False)
+
+class TestClientBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.modules = stub_client_library()
+        patcher = mock.patch.dict(sys.modules, self.modules)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.operations = {op['action']: op for op in BigQueryRunner('test_project', 'test_dataset', 'tests/dag1').get_operations()}
+
+    def test_client_has_drive_scope(self):
+        backend = ClientBackend(project_id='test_project')
+        self.modules['google.auth'].default.assert_called_once_with(scopes=CLIENT_SCOPES)
+        self.assertIn('https://www.googleapis.com/auth/drive', CLIENT_SCOPES)
+        self.assertEqual(backend.client.project, 'test_project')
+        self.assertEqual(backend.client.credentials, 'credentials')
+
+    def test_create_external_table(self):
+        client = StubClient()
+        operation = BigQueryRunner('test_project', 'test_dataset', 'tests/dag3').get_operations(object_ids=['financial_raw_orders'])[0]
+        ClientBackend(client=client).execute(operation)
+
+        table = client.tables[0]
+        self.assertEqual(table.table_ref, 'test_project.test_dataset.financial_raw_orders')
+        self.assertEqual(table.schema, [('order_id', 'STRING'), ('amount', 'NUMERIC'), ('updated_at', 'TIMESTAMP')])
+        self.assertEqual(table.external_data_configuration['sourceFormat'], 'GOOGLE_SHEETS')
+
+    def test_create_view(self):
+        client = StubClient()
+        ClientBackend(client=client).execute(self.operations['create_view'])
+        self.assertEqual(client.tables[0].table_ref, 'test_project.test_dataset.financial_trusted_sales')
+        self.assertEqual(client.tables[0].view_query, self.operations['create_view']['query'])
+
+    def test_query_to_table(self):
+        client = StubClient()
+        result = ClientBackend(client=client).execute(self.operations['query_to_table'])
+
+        query, job_config, project = client.queries[0]
+        self.assertEqual(query, self.operations['query_to_table']['query'])
+        self.assertEqual(job_config.destination, 'test_project.test_dataset.financial_refined_monthly_sales')
+        self.assertEqual(job_config.write_disposition, 'WRITE_TRUNCATE')
+        self.assertEqual(project, 'test_project')
+        self.assertEqual(result['stats']['job_id'], 'job_1')
+
+    def test_errors_are_classified(self):
+        exceptions = self.modules['google.api_core.exceptions']
+        for error, transient in [(exceptions.ServiceUnavailable('unavailable'), True), (exceptions.Conflict('Already Exists'), False),
+                                 (exceptions.GoogleAPIError('Exceeded rate limits: too many table update operations'), True)]:
+            with self.assertRaises(BackendError) as context:
+                ClientBackend(client=StubClient(error=error)).execute(self.operations['create_view'])
+            self.assertEqual(context.exception.transient, transient)
+            self.assertIn(str(error), context.exception.details)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from bigdag.auto_deps import AutoDeps
+from bigdag.catalog import Catalog
+from bigdag.dag import Dag
+from bigdag.utils import readfile
+
+class TestCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dag_folder = os.path.join(self.tmp_dir, 'dag')
+        shutil.copytree('tests/dag1', self.dag_folder)
+        self.cache_file = os.path.join(self.dag_folder, '.bigdag', 'catalog.json')
+        self.view_file = os.path.join(self.dag_folder, 'financial', 'trusted', 'sales.view.sql')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_scan(self):
+        catalog = Catalog(self.dag_folder, cache_file=self.cache_file)
+        file_names = sorted(name for _, name in catalog.entries)
+
+        self.assertEqual(file_names, [
+            'deps.yaml',
+            'monthly_sales.table.sql',
+            'sales.sheet.def.json',
+            'sales.sheet.schema.json',
+            'sales.view.sql'
+        ])
+        self.assertEqual(catalog.read(self.view_file), readfile(self.view_file))
+
+        # The cache itself lives in a hidden folder and is not scanned
+        self.assertTrue(os.path.exists(self.cache_file))
+        self.assertEqual(len(Catalog(self.dag_folder, cache_file=self.cache_file).entries), 5)
+
+    def test_unchanged_files_are_read_from_cache(self):
+        Catalog(self.dag_folder, cache_file=self.cache_file)
+        with open(self.cache_file) as file:
+            cache = json.load(file)
+        cache['files'][self.view_file]['content'] = 'SELECT 1'
+        with open(self.cache_file, 'w') as file:
+            json.dump(cache, file)
+
+        catalog = Catalog(self.dag_folder, cache_file=self.cache_file)
+        self.assertEqual(catalog.read(self.view_file), 'SELECT 1')
+
+    def test_identifiers_are_read_from_cache(self):
+        # Queries are tokenized when the dependencies are detected, then cached
+        Dag(self.dag_folder, catalog=Catalog(self.dag_folder, cache_file=self.cache_file))
+        with open(self.cache_file) as file:
+            cache = json.load(file)
+        self.assertIn('financial_raw_sales', cache['files'][self.view_file]['identifiers'])
+        cache['files'][self.view_file]['identifiers'] = ['financial_refined_monthly_sales']
+        with open(self.cache_file, 'w') as file:
+            json.dump(cache, file)
+
+        # Dependencies come from the cached identifiers, without tokenizing the query
+        catalog = Catalog(self.dag_folder, cache_file=self.cache_file)
+        self.assertEqual(catalog.identifiers(self.view_file), {'financial_refined_monthly_sales'})
+        self.assertEqual(AutoDeps(self.dag_folder, catalog=catalog).get_references('financial_trusted_sales'),
+                         ['financial_refined_monthly_sales'])
+
+    def test_changed_files_are_read_again(self):
+        Catalog(self.dag_folder, cache_file=self.cache_file)
+        with open(self.view_file, 'w') as file:
+            file.write('SELECT 2 FROM financial_raw_sales')
+
+        catalog = Catalog(self.dag_folder, cache_file=self.cache_file)
+        self.assertEqual(catalog.read(self.view_file), 'SELECT 2 FROM financial_raw_sales')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from click.testing import CliRunner
+from bigdag.backends import FakeBackend
+from bigdag.cli import cli
+from bigdag.telemetry import JsonLinesWriter
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dag_folder = os.path.join(self.tmp_dir.name, 'dag')
+        shutil.copytree('tests/dag2', self.dag_folder)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _invoke(self, *args):
+        return CliRunner().invoke(cli, ['-p', 'test_project', '-f', self.dag_folder, '-b', 'fake'] + list(args))
+
+    def test_fake_backend_keeps_no_state(self):
+        result = self._invoke('-d', 'prod')
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('all commands executed successfully', result.output)
+        for name in ['state.json', 'checkpoint.jsonl', 'history.jsonl']:
+            self.assertFalse(os.path.exists(os.path.join(self.dag_folder, '.bigdag', name)))
+
+    def test_over_the_byte_limit_exits_with_an_error(self):
+        backend = FakeBackend(estimates={'refined_logistics_regional_product_table1': 2048})
+        with mock.patch('bigdag.cli.create_backend', return_value=backend):
+            result = self._invoke('-d', 'prod', '--max-bytes', '1024')
+            self.assertEqual(result.exit_code, 1)
+            self.assertIn('Estimated bytes processed over', result.output)
+            self.assertEqual(backend.calls, [])
+
+            result = self._invoke('-d', 'prod', '--estimate', '--max-bytes', '1024')
+            self.assertEqual(result.exit_code, 1)
+            self.assertIn('refined_logistics_regional_product_table1 2.00 KB [over limit]', result.output)
+
+            result = self._invoke('-d', 'prod', '--estimate', '--max-bytes', '4096')
+            self.assertEqual(result.exit_code, 0, result.output)
+
+    def test_failed_dataset_exits_with_an_error(self):
+        events_file = os.path.join(self.tmp_dir.name, 'events.jsonl')
+        backend = FakeBackend(fail=['refined_logistics_regional_product_table2'])
+        with mock.patch('bigdag.cli.create_backend', return_value=backend), \
+                mock.patch('bigdag.cli.JsonLinesWriter', wraps=JsonLinesWriter) as writer:
+            result = self._invoke('-d', 'eu', '-d', 'us', '--events', events_file)
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn('2 of 2 datasets failed: eu, us', result.output)
+
+        # Both datasets append their events through one writer
+        writer.assert_called_once_with(events_file)
+        with open(events_file) as file:
+            events = [json.loads(line) for line in file]
+        self.assertEqual({event['dataset'] for event in events}, {'eu', 'us'})
+
+if __name__ == '__main__':
+    unittest.main()
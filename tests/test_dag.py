@@ -48,5 +48,24 @@ class TestDag(unittest.TestCase):
         ]
         self.assertEqual(execution_order, expected_order)
 
+    def test_get_levels(self):
+        dag = Dag('tests/dag2')
+        expected_levels = [
+            ['raw_logistics_regional_stock'],
+            ['trusted_logistics_regional_stock_view1', 'trusted_logistics_regional_stock_view2'],
+            ['refined_logistics_regional_product_table1', 'refined_logistics_regional_product_table2']
+        ]
+        self.assertEqual(dag.get_levels(), expected_levels)
+        self.assertIs(dag.get_graph(), dag.get_graph())
+
+    def test_get_dependencies(self):
+        dag = Dag('tests/dag2')
+        dependencies = dag.get_dependencies()
+        self.assertEqual(dependencies['raw_logistics_regional_stock'], set())
+        self.assertEqual(dependencies['refined_logistics_regional_product_table1'], {'trusted_logistics_regional_stock_view1'})
+
+        selected = dag.get_dependencies(['raw_logistics_regional_stock', 'refined_logistics_regional_product_table2'])
+        self.assertEqual(selected['refined_logistics_regional_product_table2'], {'raw_logistics_regional_stock'})
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,75 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+from bigdag.backends import BackendError, FakeBackend
+from bigdag.bigquery_runner import BigQueryRunner
+
+class TestEstimate(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = FakeBackend(estimates={
+            'trusted_logistics_regional_stock_view1': 1024,
+            'trusted_logistics_regional_stock_view2': 2048,
+            'refined_logistics_regional_product_table1': 10 * 1024 ** 3
+        })
+        self.runner = BigQueryRunner('test_project', 'test_dataset', 'tests/dag2', backend=self.backend)
+
+    def test_estimate(self):
+        estimates = self.runner.estimate()
+        self.assertEqual([(e['object_id'], e['zone'], e['bytes']) for e in estimates], [
+            ('trusted_logistics_regional_stock_view1', 'trusted', 1024),
+            ('trusted_logistics_regional_stock_view2', 'trusted', 2048),
+            ('refined_logistics_regional_product_table1', 'refined', 10 * 1024 ** 3),
+            ('refined_logistics_regional_product_table2', 'refined', 0)
+        ])
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            over_limit = self.runner.print_estimate(estimates, max_bytes=1024 ** 3)
+        self.assertEqual(over_limit, ['refined_logistics_regional_product_table1'])
+        self.assertIn("refined_logistics_regional_product_table1 10.00 GB [over limit]", output.getvalue())
+        self.assertIn("zone trusted: 3.00 KB", output.getvalue())
+
+    def test_run_fails_before_executing_over_limit(self):
+        with redirect_stdout(io.StringIO()), self.assertRaises(RuntimeError):
+            self.runner.run_commands(max_bytes=1024 ** 3)
+        self.assertEqual(self.backend.calls, [])
+
+        with redirect_stdout(io.StringIO()):
+            self.runner.run_commands(max_bytes=100 * 1024 ** 3)
+        self.assertEqual(len(self.backend.calls), 5)
+
+class DryRunBackend(FakeBackend):
+    # Dry runs fail on the incremental table while it does not exist
+
+    def __init__(self, table_exists):
+        super().__init__()
+        self.table_exists = table_exists
+        self.estimated = []
+
+    def estimate(self, operation):
+        query = operation.get('estimate_query', operation['query'])
+        self.estimated.append(query)
+        if not self.table_exists and 'financial_refined_orders' in query:
+            raise BackendError("Dry run failed", details="Not found: Table test_project:test_dataset.financial_refined_orders")
+        return 1024 if 'MAX(updated_at)' in query else 1024 ** 3
+
+class TestIncrementalEstimate(unittest.TestCase):
+
+    def _estimate(self, backend):
+        runner = BigQueryRunner('test_project', 'test_dataset', 'tests/dag3', backend=backend)
+        return runner.estimate(object_ids=['financial_refined_orders'])[0]['bytes']
+
+    def test_increment_is_estimated(self):
+        backend = DryRunBackend(table_exists=True)
+        self.assertEqual(self._estimate(backend), 1024)
+        self.assertIn("WHERE (SELECT MAX(updated_at) FROM `test_project.test_dataset.financial_refined_orders`) IS NULL", backend.estimated[0])
+
+    def test_full_query_is_estimated_before_the_first_run(self):
+        backend = DryRunBackend(table_exists=False)
+        self.assertEqual(self._estimate(backend), 1024 ** 3)
+        self.assertEqual(len(backend.estimated), 2)
+        self.assertTrue(backend.estimated[1].startswith("SELECT order_id, amount, updated_at"))
+
+if __name__ == '__main__':
+    unittest.main()
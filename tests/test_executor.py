@@ -0,0 +1,90 @@
+import threading
+import time
+import unittest
+from bigdag.executor import ParallelExecutor
+
+class TestParallelExecutor(unittest.TestCase):
+
+    def test_run_respects_dependencies(self):
+        tasks = ['a', 'b', 'c', 'd']
+        dependencies = {'b': {'a'}, 'c': {'a'}, 'd': {'b', 'c'}}
+        finished = []
+        lock = threading.Lock()
+
+        def worker(task):
+            time.sleep(0.01)
+            with lock:
+                finished.append(task)
+
+        completed, failed, cancelled = ParallelExecutor(2).run(tasks, dependencies, worker)
+
+        self.assertEqual(finished[0], 'a')
+        self.assertEqual(finished[-1], 'd')
+        self.assertEqual(sorted(completed), tasks)
+        self.assertEqual(failed, {})
+        self.assertEqual(cancelled, [])
+
+    def test_run_is_bounded_by_jobs(self):
+        tasks = [f"t{i}" for i in range(8)]
+        active = []
+        peak = []
+        lock = threading.Lock()
+        # The first three tasks wait for each other, so three run together whatever the timing
+        barrier = threading.Barrier(3, timeout=5)
+
+        def worker(task):
+            with lock:
+                active.append(task)
+                peak.append(len(active))
+            if task in tasks[:3]:
+                barrier.wait()
+            time.sleep(0.01)
+            with lock:
+                active.remove(task)
+
+        ParallelExecutor(3).run(tasks, {}, worker)
+
+        self.assertEqual(max(peak), 3)
+
+    def test_run_cancels_dependents_of_failed_task(self):
+        tasks = ['a', 'b', 'c', 'd']
+        dependencies = {'b': {'a'}, 'c': {'b'}}
+
+        def worker(task):
+            if task == 'a':
+                raise RuntimeError("Command failed: a")
+
+        completed, failed, cancelled = ParallelExecutor(2).run(tasks, dependencies, worker)
+
+        self.assertEqual(completed, ['d'])
+        self.assertEqual(list(failed), ['a'])
+        self.assertEqual(sorted(cancelled), ['b', 'c'])
+
+    def test_run_respects_group_limits(self):
+        tasks = ['heavy1', 'heavy2', 'heavy3', 'light1', 'light2']
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def worker(task):
+            with lock:
+                active.append(task)
+                peak.append(sum(1 for current in active if current.startswith('heavy')))
+            time.sleep(0.02)
+            with lock:
+                active.remove(task)
+
+        executor = ParallelExecutor(4, limits={'heavy': 1})
+        completed, _, _ = executor.run(tasks, {}, worker, groups=lambda task: ['heavy'] if task.startswith('heavy') else [])
+
+        self.assertEqual(max(peak), 1)
+        self.assertEqual(sorted(completed), sorted(tasks))
+
+    def test_run_starts_highest_priority_first(self):
+        started = []
+        priorities = {'a': 1, 'b': 3, 'c': 2}
+        ParallelExecutor(1).run(['a', 'b', 'c'], {}, started.append, priority=priorities.get)
+        self.assertEqual(started, ['b', 'c', 'a'])
+
+if __name__ == '__main__':
+    unittest.main()
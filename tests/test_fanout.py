@@ -0,0 +1,101 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from bigdag.backends import FakeBackend
+from bigdag.fanout import create_runners, print_failures, read_datasets_file, run_datasets
+from bigdag.state import Checkpoint, DurationHistory
+
+class TestFanout(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.state_file = os.path.join(self.tmp_dir.name, 'state.json')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_runners_share_the_dag(self):
+        runners = create_runners('test_project', 'tests/dag2', ['eu', 'us'], jobs=2, backend=FakeBackend())
+        self.assertIs(runners[0].dag, runners[1].dag)
+        self.assertIs(runners[0].templates, runners[1].templates)
+        self.assertIs(runners[0].slots, runners[1].slots)
+        self.assertEqual([runner.output_prefix for runner in runners], ['[eu] ', '[us] '])
+
+        commands = runners[1].get_commands(object_ids=['trusted_logistics_regional_stock_view1'])
+        self.assertIn(' us.trusted_logistics_regional_stock_view1', commands[0]['command'])
+
+    def test_failed_dataset_does_not_stop_the_others(self):
+        runners = create_runners('test_project', 'tests/dag2', ['eu', 'us'], jobs=2, backend=FakeBackend(), state_file=self.state_file)
+        runners[1].backend = FakeBackend(fail=['trusted_logistics_regional_stock_view2'])
+        with redirect_stdout(io.StringIO()) as output:
+            failures = run_datasets(runners, jobs=2)
+            print_failures(runners, failures)
+
+        self.assertEqual(list(failures), ['us'])
+        self.assertIn('[us] ', output.getvalue())
+        self.assertIn('dataset eu: ok\ndataset us: failed\n', output.getvalue())
+        self.assertEqual(len(runners[0].backend.calls), 5)
+
+        # Both datasets are kept in the same state file
+        with open(self.state_file) as file:
+            state = json.load(file)
+        self.assertEqual(len(state['test_project.eu']), 5)
+        self.assertNotIn('refined_logistics_regional_product_table2', state['test_project.us'])
+
+    def test_read_datasets_file(self):
+        datasets_file = os.path.join(self.tmp_dir.name, 'datasets.txt')
+        with open(datasets_file, 'w') as file:
+            file.write("# tenants\neu\n\n  us  \n")
+        self.assertEqual(read_datasets_file(datasets_file), ['eu', 'us'])
+
+class TestSharedFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _lines(self, json_file):
+        with open(json_file) as file:
+            return file.readlines()
+
+    def test_checkpoint_appends_one_line_per_object(self):
+        checkpoint_file = os.path.join(self.tmp_dir.name, 'checkpoint.jsonl')
+        eu, us = Checkpoint(checkpoint_file, 'p.eu'), Checkpoint(checkpoint_file, 'p.us')
+        eu.mark_dataset_created()
+        for obj_id in ['a', 'b']:
+            eu.mark_completed(obj_id)
+            us.mark_completed(obj_id)
+        self.assertEqual(len(self._lines(checkpoint_file)), 5)
+
+        # A killed process may leave the last line cut short
+        with open(checkpoint_file, 'a') as file:
+            file.write('{"key": "p.eu", "compl')
+        resumed = Checkpoint(checkpoint_file, 'p.eu')
+        self.assertEqual((resumed.completed, resumed.dataset_created), ({'a', 'b'}, True))
+
+        eu.clear()
+        self.assertEqual(Checkpoint(checkpoint_file, 'p.us').completed, {'a', 'b'})
+        self.assertEqual(Checkpoint(checkpoint_file, 'p.eu').completed, set())
+        us.clear()
+        self.assertFalse(os.path.exists(checkpoint_file))
+
+    def test_history_appends_one_line_per_run(self):
+        history_file = os.path.join(self.tmp_dir.name, 'history.jsonl')
+        for duration in [4.0, 2.0, 1.0]:
+            history = DurationHistory(history_file, 'p.eu')
+            history.compact_after = 2
+            history({'event': 'object_end', 'status': 'ok', 'object_id': 'a', 'duration': duration})
+            history({'event': 'run_end'})
+            DurationHistory(history_file, 'p.us')({'event': 'run_end'})
+
+        # The third run merged the records of the dataset back into one
+        self.assertEqual(len(self._lines(history_file)), 1)
+        self.assertEqual(DurationHistory(history_file, 'p.eu').get('a'), 2.0)
+
+if __name__ == '__main__':
+    unittest.main()
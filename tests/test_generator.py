@@ -0,0 +1,25 @@
+import os
+import tempfile
+import unittest
+from benchmarks.generator import generate_dag
+from bigdag.dag import Dag
+
+class TestGenerator(unittest.TestCase):
+
+    def test_generated_dag_loads(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dag_folder = os.path.join(tmp_dir, 'dag')
+            layers = generate_dag(dag_folder, objects=60, depth=6, fan_in=3, deps_density=0.5)
+            dag = Dag(dag_folder)
+
+            self.assertEqual(sorted(dag.get_execution_order()), sorted(obj_id for layer in layers for obj_id in layer))
+            self.assertTrue(all(dag.get_type(obj_id) == 'sheet' for obj_id in layers[0]))
+            # Every object past the first layer reads from earlier layers
+            dependencies = dag.get_dependencies()
+            for layer in layers[1:]:
+                for obj_id in layer:
+                    self.assertTrue(dependencies[obj_id])
+            self.assertTrue(dag.dependencies)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+from bigdag.bigquery_runner import BigQueryRunner
+from bigdag.dag import Dag
+from bigdag.incremental import build_script, load_config
+
+class TestIncremental(unittest.TestCase):
+
+    def test_get_type(self):
+        dag = Dag('tests/dag3')
+        self.assertEqual(dag.get_type('financial_refined_orders'), 'incremental')
+        self.assertEqual(dag.get_execution_order(), ['financial_raw_orders', 'financial_refined_orders'])
+
+    def test_get_commands(self):
+        runner = BigQueryRunner('test_project', 'test_dataset', 'tests/dag3')
+        operations = runner.get_operations(object_ids=['financial_refined_orders'])
+
+        self.assertEqual(len(operations), 1)
+        operation = operations[0]
+        self.assertEqual(operation['action'], 'run_script')
+        self.assertEqual(operation['description'], 'updating incremental table financial_refined_orders')
+        self.assertTrue(operation['command'].startswith('bq query --project_id test_project --use_legacy_sql=false "IF NOT EXISTS'))
+        self.assertIn("PARTITION BY DATE(updated_at)\nCLUSTER BY order_id", operation['query'])
+        self.assertIn("MERGE `test_project.test_dataset.financial_refined_orders` AS target", operation['query'])
+        self.assertIn("FROM `test_project.test_dataset.financial_raw_orders`\n)", operation['query'])
+
+    def test_append_script(self):
+        config = load_config('watermark: updated_at', 'orders.incremental.yaml')
+        script = build_script('p', 'd', 'orders', 'SELECT * FROM source;', config)
+        self.assertEqual(script, (
+            "IF NOT EXISTS (SELECT 1 FROM `p.d`.INFORMATION_SCHEMA.TABLES WHERE table_name = 'orders') THEN\n"
+            "CREATE TABLE `p.d.orders`\n"
+            "AS\n"
+            "SELECT * FROM source;\n"
+            "ELSE\n"
+            "BEGIN\n"
+            "DECLARE _bigdag_watermark DEFAULT (SELECT MAX(updated_at) FROM `p.d.orders`);\n"
+            "INSERT INTO `p.d.orders`\n"
+            "SELECT * FROM (\n"
+            "SELECT * FROM source\n"
+            ")\n"
+            "WHERE _bigdag_watermark IS NULL\n"
+            "OR updated_at > _bigdag_watermark;\n"
+            "END;\n"
+            "END IF;"
+        ))
+
+    def test_merge_deletes_in_the_partitions_of_the_increment(self):
+        config = load_config('watermark: updated_at\nstrategy: merge\nunique_key: order_id\npartition_by: DATE(created_at)', 'orders.incremental.yaml')
+        script = build_script('p', 'd', 'orders', 'SELECT * FROM source', config)
+        self.assertIn("DECLARE _bigdag_partitions DEFAULT (SELECT ARRAY_AGG(DISTINCT DATE(created_at) IGNORE NULLS) FROM _bigdag_increment);\n"
+                      "MERGE `p.d.orders` AS target", script)
+        self.assertIn("WHEN NOT MATCHED BY SOURCE AND (DATE(created_at) IN UNNEST(_bigdag_partitions) OR DATE(created_at) IS NULL) "
+                      "AND target.order_id IN (SELECT order_id FROM _bigdag_increment) THEN DELETE", script)
+
+        # Rows move between partitions of the watermark, so all of them are searched
+        config['partition_by'] = 'DATE(updated_at)'
+        script = build_script('p', 'd', 'orders', 'SELECT * FROM source', config)
+        self.assertNotIn('_bigdag_partitions', script)
+        self.assertIn("WHEN NOT MATCHED BY SOURCE AND target.order_id IN (SELECT order_id FROM _bigdag_increment) THEN DELETE", script)
+
+    def test_invalid_config(self):
+        with self.assertRaises(ValueError):
+            load_config('strategy: append', 'orders.incremental.yaml')
+        with self.assertRaises(ValueError):
+            load_config('watermark: updated_at\nstrategy: merge', 'orders.incremental.yaml')
+
+if __name__ == '__main__':
+    unittest.main()
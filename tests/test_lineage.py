@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import unittest
+from bigdag.catalog import Catalog
+from bigdag.lineage import LineageIndex, extract_columns
+
+class TestExtractColumns(unittest.TestCase):
+
+    def test_qualified_and_unqualified_columns(self):
+        query = """
+            -- orders.ignored
+            SELECT o.id, c.name AS customer, `status`, SUM(o.amount) AS total
+            FROM `{{project_id}}.{{dataset}}.sales_orders` AS o
+            JOIN sales_customers c ON c.id = o.customer_id
+            WHERE note != 'c.secret'
+            GROUP BY 1, 2, 3
+        """
+        self.assertEqual(extract_columns(query, {'sales_orders', 'sales_customers', 'sales_other'}), {
+            ('sales_orders', 'id'), ('sales_orders', 'amount'), ('sales_orders', 'customer_id'),
+            ('sales_customers', 'name'), ('sales_customers', 'id'),
+            # Unqualified columns may come from either table
+            ('sales_orders', 'status'), ('sales_customers', 'status'), ('sales_orders', 'note'), ('sales_customers', 'note')
+        })
+
+    def test_star_reads_every_column(self):
+        self.assertEqual(extract_columns("SELECT o.*, COUNT(*) FROM sales_orders o, sales_customers", {'sales_orders', 'sales_customers'}),
+                         {('sales_orders', '*'), ('sales_customers', '*')})
+
+class TestLineageIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dag_folder = os.path.join(self.tmp_dir.name, 'dag')
+        shutil.copytree('tests/dag2', self.dag_folder)
+        self.index = LineageIndex(os.path.join(self.tmp_dir.name, 'lineage.db'))
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp_dir.cleanup()
+
+    def test_impact_follows_the_column_downstream(self):
+        self.index.update(self.dag_folder, Catalog(self.dag_folder))
+        self.assertEqual(self.index.get_impact('raw_logistics_regional_stock', 'REGION'), {
+            'trusted_logistics_regional_stock_view2': (1, 'raw_logistics_regional_stock'),
+            'refined_logistics_regional_product_table2': (2, 'trusted_logistics_regional_stock_view2')
+        })
+        self.assertEqual(self.index.get_readers('trusted_logistics_regional_stock_view1', 'region'), [])
+
+    def test_update_parses_changed_files_only(self):
+        self.assertEqual(self.index.update(self.dag_folder, Catalog(self.dag_folder)), 4)
+        self.assertEqual(self.index.update(self.dag_folder, Catalog(self.dag_folder)), 0)
+
+        with open(os.path.join(self.dag_folder, 'refined/logistics/regional/product_table1.table.sql'), 'w') as file:
+            file.write("SELECT v.region FROM trusted_logistics_regional_stock_view1 v")
+        self.assertEqual(self.index.update(self.dag_folder, Catalog(self.dag_folder)), 1)
+        self.assertEqual(self.index.get_readers('trusted_logistics_regional_stock_view1', 'total_quantity'), [])
+        self.assertEqual(self.index.get_readers('trusted_logistics_regional_stock_view1', 'region'),
+                         ['refined_logistics_regional_product_table1'])
+
+        # The index is kept on disk
+        self.index.close()
+        self.index = LineageIndex(os.path.join(self.tmp_dir.name, 'lineage.db'))
+        self.assertEqual(self.index.update(self.dag_folder, Catalog(self.dag_folder)), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,24 @@
+import unittest
+import networkx as nx
+from bigdag.ordering import get_levels, get_nearest_dependencies
+
+class TestOrdering(unittest.TestCase):
+
+    def test_get_levels_uses_longest_path(self):
+        graph = nx.DiGraph([('a', 'b'), ('b', 'c'), ('a', 'c'), ('d', 'c'), ('e', 'b')])
+        graph.add_node('f')
+        self.assertEqual(get_levels(graph), [['a', 'd', 'e', 'f'], ['b'], ['c']])
+
+    def test_get_levels_detects_cycles(self):
+        graph = nx.DiGraph([('a', 'b'), ('b', 'c'), ('c', 'b')])
+        with self.assertRaises(ValueError):
+            get_levels(graph)
+
+    def test_get_nearest_dependencies(self):
+        graph = nx.DiGraph([('a', 'b'), ('b', 'c'), ('c', 'd'), ('a', 'd')])
+        order = [node for level in get_levels(graph) for node in level]
+        dependencies = get_nearest_dependencies(graph, order, {'a', 'c', 'd'})
+        self.assertEqual(dependencies, {'a': set(), 'c': {'a'}, 'd': {'a', 'c'}})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+from bigdag.progress import ProgressView
+
+class TestProgressView(unittest.TestCase):
+
+    def test_render_counts_objects(self):
+        now = [100.0]
+        view = ProgressView(interval=3600, clock=lambda: now[0])
+        view({'event': 'run_start', 'ts': 100.0, 'objects': 5})
+        view({'event': 'object_start', 'ts': 100.0, 'object_id': 'a'})
+        view({'event': 'object_end', 'ts': 102.0, 'object_id': 'a', 'status': 'ok'})
+        view({'event': 'object_start', 'ts': 102.0, 'object_id': 'b'})
+        view({'event': 'object_start', 'ts': 104.0, 'object_id': 'c'})
+        now[0] = 110.0
+
+        self.assertEqual(view.render(), "progress 10s: 2 running, 2 queued, 1 done | b 8s, c 6s")
+
+        view({'event': 'object_end', 'ts': 111.0, 'object_id': 'b', 'status': 'failed'})
+        view({'event': 'object_skipped', 'ts': 111.0, 'object_id': 'd', 'status': 'skipped'})
+        self.assertEqual(view.render(), "progress 10s: 1 running, 1 queued, 2 done (1 failed), 1 skipped | c 6s")
+        view({'event': 'run_end', 'ts': 112.0, 'status': 'failed'})
+        self.assertIsNone(view._thread)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+from bigdag.backends import FakeBackend, parse_metadata
+from bigdag.bigquery_runner import BigQueryRunner
+
+SHEET_COLUMNS = [
+    {'column_name': 'product_id', 'data_type': 'STRING', 'is_nullable': 'NO'},
+    {'column_name': 'quantity', 'data_type': 'INT64', 'is_nullable': 'NO'},
+    {'column_name': 'region', 'data_type': 'STRING', 'is_nullable': 'NO'}
+]
+SHEET_OPTIONS = [
+    {'option_name': 'format', 'option_value': '"GOOGLE_SHEETS"'},
+    {'option_name': 'uris', 'option_value': '["https://docs.google.com/spreadsheets/d/FAKE_SPREADSHEET_ID"]'},
+    {'option_name': 'sheet_range', 'option_value': '"stock!A1:Z"'},
+    {'option_name': 'skip_leading_rows', 'option_value': '1'}
+]
+
+def dataset_rows(view_query):
+    # Rows as returned by the metadata query for a deployed tests/dag2
+    return [
+        {'table_name': 'raw_logistics_regional_stock', 'table_type': 'EXTERNAL', 'columns': SHEET_COLUMNS, 'options': SHEET_OPTIONS},
+        {'table_name': 'trusted_logistics_regional_stock_view1', 'table_type': 'VIEW', 'view_definition': view_query},
+        {'table_name': 'trusted_logistics_regional_stock_view2', 'table_type': 'VIEW',
+         'view_definition': "SELECT region, SUM(quantity) as total_quantity\nFROM raw_logistics_regional_stock\nGROUP BY region;"},
+        {'table_name': 'refined_logistics_regional_product_table1', 'table_type': 'BASE TABLE'}
+    ]
+
+class TestReconcile(unittest.TestCase):
+
+    def _runner(self, rows):
+        return BigQueryRunner('test_project', 'test_dataset', 'tests/dag2', backend=FakeBackend(metadata=parse_metadata(rows)))
+
+    def test_unchanged_views_and_sheets_are_skipped(self):
+        runner = self._runner(dataset_rows("SELECT product_id, SUM(quantity) as total_quantity\nFROM raw_logistics_regional_stock\nGROUP BY product_id;"))
+        commands = runner.get_commands(reconcile=True)
+        self.assertEqual([cmd['description'] for cmd in commands], [
+            'creating table refined_logistics_regional_product_table1',
+            'creating table refined_logistics_regional_product_table2'
+        ])
+
+    def test_changed_view_is_deployed(self):
+        runner = self._runner(dataset_rows("SELECT product_id FROM raw_logistics_regional_stock"))
+        with redirect_stdout(io.StringIO()) as output:
+            runner.run_commands(reconcile=True)
+
+        # The view is in the dataset, so it is replaced in place
+        self.assertEqual([(op['action'], op['object_id']) for op in runner.backend.calls], [
+            ('run_script', 'trusted_logistics_regional_stock_view1'),
+            ('query_to_table', 'refined_logistics_regional_product_table1'),
+            ('query_to_table', 'refined_logistics_regional_product_table2')
+        ])
+        self.assertTrue(runner.backend.calls[0]['query'].startswith('CREATE OR REPLACE VIEW'))
+        self.assertIn('2 objects unchanged in dataset test_dataset', output.getvalue())
+        self.assertEqual(runner.recorder.objects['raw_logistics_regional_stock']['status'], 'unchanged')
+
+    def test_changed_views_are_replaced_in_batches(self):
+        rows = dataset_rows("SELECT product_id FROM raw_logistics_regional_stock")
+        rows[2] = dict(rows[2], view_definition="SELECT region FROM raw_logistics_regional_stock")
+        operations = self._runner(rows).get_operations(view_batch_size=10, reconcile=True)
+        self.assertEqual(operations[0]['query'].count('CREATE OR REPLACE VIEW'), 2)
+
+    def test_changed_sheet_is_dropped(self):
+        rows = dataset_rows("")
+        rows[0] = dict(rows[0], columns=SHEET_COLUMNS[:2])
+        commands = self._runner(rows).get_commands(object_ids=['type:sheet'], reconcile=True)
+        self.assertEqual([cmd['description'] for cmd in commands], [
+            'dropping spreadsheet raw_logistics_regional_stock',
+            'creating spreadsheet raw_logistics_regional_stock'
+        ])
+
+    def test_changed_sheet_schema_is_deployed(self):
+        rows = dataset_rows("")
+        rows[0] = dict(rows[0], columns=SHEET_COLUMNS[:2])
+        unchanged = self._runner(rows).get_unchanged_objects(['raw_logistics_regional_stock'], parse_metadata(rows))
+        self.assertEqual(unchanged, [])
+
+    def test_missing_dataset_deploys_everything(self):
+        self.assertEqual(len(self._runner([]).get_commands(reconcile=True)), 5)
+
+    def test_reconcile_cannot_recreate_objects(self):
+        with self.assertRaises(ValueError):
+            self._runner([]).get_commands(object_ids=['type:view'], recreate=True, reconcile=True)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from bigdag.backends import BackendError, FakeBackend
+from bigdag.bigquery_runner import BigQueryRunner
+
+class TestRetryAndResume(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.checkpoint_file = os.path.join(self.tmp_dir.name, 'checkpoint.json')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _runner(self, backend, **kwargs):
+        return BigQueryRunner('test_project', 'test_dataset', 'tests/dag2', backend=backend,
+                              checkpoint_file=self.checkpoint_file, retry_backoff=0.001, **kwargs)
+
+    def test_transient_failures_are_retried(self):
+        backend = FakeBackend(transient_failures={'trusted_logistics_regional_stock_view1': 2})
+        runner = self._runner(backend)
+        with redirect_stdout(io.StringIO()):
+            runner.run_commands()
+
+        self.assertEqual(len(backend.calls), 7)
+        self.assertEqual(runner.recorder.objects['trusted_logistics_regional_stock_view1']['retries'], 2)
+
+    def test_retries_are_limited(self):
+        backend = FakeBackend(transient_failures={'trusted_logistics_regional_stock_view1': 5})
+        with redirect_stdout(io.StringIO()), self.assertRaises(BackendError):
+            self._runner(backend, retries=1).run_commands()
+
+    def test_resume_skips_completed_objects(self):
+        with redirect_stdout(io.StringIO()), self.assertRaises(BackendError):
+            self._runner(FakeBackend(fail=['refined_logistics_regional_product_table1'])).run_commands(recreate=True)
+
+        backend = FakeBackend()
+        with redirect_stdout(io.StringIO()):
+            self._runner(backend).run_commands(recreate=True, resume=True)
+        self.assertEqual([op['object_id'] for op in backend.calls], [
+            'refined_logistics_regional_product_table1',
+            'refined_logistics_regional_product_table2'
+        ])
+
+        # A successful run clears the checkpoint
+        self.assertFalse(os.path.exists(self.checkpoint_file))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from bigdag.backends import FakeBackend
+from bigdag.bigquery_runner import BigQueryRunner
+from bigdag.scheduler import get_groups, get_priorities, parse_limits
+
+class TestScheduler(unittest.TestCase):
+
+    def test_parse_limits(self):
+        self.assertEqual(parse_limits(['refined=2', 'trusted/logistics=4']), {'refined': 2, 'trusted/logistics': 4})
+        with self.assertRaises(ValueError):
+            parse_limits(['refined'])
+        with self.assertRaises(ValueError):
+            parse_limits(['refined=0'])
+
+    def test_get_groups(self):
+        self.assertEqual(get_groups('trusted/logistics/regional'), ['trusted', 'trusted/logistics', 'trusted/logistics/regional'])
+        self.assertEqual(get_groups(None), [])
+
+    def test_get_priorities(self):
+        order = ['a', 'b', 'c', 'd']
+        dependencies = {'c': {'a'}, 'd': {'b'}}
+        priorities = get_priorities(order, dependencies, {'a': 1.0, 'b': 2.0, 'c': 10.0})
+        # d has no history and gets the average of the known durations
+        self.assertEqual(priorities, {'d': 13 / 3, 'c': 10.0, 'b': 2.0 + 13 / 3, 'a': 11.0})
+
+    def test_history_is_recorded(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            history_file = os.path.join(tmp_dir, 'history.json')
+            runner = BigQueryRunner('test_project', 'test_dataset', 'tests/dag2', backend=FakeBackend(), history_file=history_file)
+            with redirect_stdout(io.StringIO()):
+                runner.run_commands(jobs=2, zone_limits={'trusted': 1})
+
+            history = BigQueryRunner('test_project', 'test_dataset', 'tests/dag2', history_file=history_file).history
+            self.assertIsNotNone(history.get('raw_logistics_regional_stock'))
+            self.assertEqual(len(history.durations), 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from bigdag.bigquery_runner import BigQueryRunner
+from bigdag.dag import Dag
+from bigdag.selectors import select_objects
+
+class TestSelectors(unittest.TestCase):
+
+    def setUp(self):
+        self.dag = Dag('tests/dag2')
+
+    def test_exact_and_glob(self):
+        self.assertEqual(select_objects(self.dag, ['raw_logistics_regional_stock']), {'raw_logistics_regional_stock'})
+        self.assertEqual(select_objects(self.dag, ['refined_logistics_*']), {
+            'refined_logistics_regional_product_table1',
+            'refined_logistics_regional_product_table2'
+        })
+
+    def test_upstream_and_downstream(self):
+        self.assertEqual(select_objects(self.dag, ['+refined_logistics_regional_product_table1']), {
+            'raw_logistics_regional_stock',
+            'trusted_logistics_regional_stock_view1',
+            'refined_logistics_regional_product_table1'
+        })
+        self.assertEqual(select_objects(self.dag, ['trusted_logistics_regional_stock_view2+']), {
+            'trusted_logistics_regional_stock_view2',
+            'refined_logistics_regional_product_table2'
+        })
+
+    def test_path_and_type(self):
+        self.assertEqual(select_objects(self.dag, ['path:trusted/logistics']), {
+            'trusted_logistics_regional_stock_view1',
+            'trusted_logistics_regional_stock_view2'
+        })
+        self.assertEqual(select_objects(self.dag, ['type:sheet']), {'raw_logistics_regional_stock'})
+
+    def test_unknown_selector(self):
+        with self.assertRaises(ValueError):
+            select_objects(self.dag, ['missing_object+'])
+
+    def test_get_commands_with_selector(self):
+        runner = BigQueryRunner('test_project', 'test_dataset', 'tests/dag2')
+        commands = runner.get_commands(object_ids=['raw_logistics_regional_stock+'])
+        self.assertEqual([cmd_info['description'] for cmd_info in commands], [
+            'creating spreadsheet raw_logistics_regional_stock',
+            'creating view trusted_logistics_regional_stock_view1',
+            'creating view trusted_logistics_regional_stock_view2',
+            'creating table refined_logistics_regional_product_table1',
+            'creating table refined_logistics_regional_product_table2'
+        ])
+
+if __name__ == '__main__':
+    unittest.main()
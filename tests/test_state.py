@@ -0,0 +1,71 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from bigdag.backends import FakeBackend
+from bigdag.bigquery_runner import BigQueryRunner
+
+class TestIncrementalBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dag_folder = os.path.join(self.tmp_dir, 'dag')
+        shutil.copytree('tests/dag2', self.dag_folder)
+        self.state_file = os.path.join(self.dag_folder, '.bigdag', 'state.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _run(self, **kwargs):
+        backend = FakeBackend()
+        runner = BigQueryRunner('test_project', 'test_dataset', self.dag_folder, backend=backend, state_file=self.state_file)
+        with redirect_stdout(io.StringIO()):
+            runner.run_commands(**kwargs)
+        return [op['object_id'] for op in backend.calls]
+
+    def test_changed_only_skips_unchanged_objects(self):
+        self.assertEqual(len(self._run()), 5)
+        self.assertTrue(os.path.exists(self.state_file))
+        self.assertEqual(self._run(changed_only=True), [])
+
+    def test_changed_only_rebuilds_downstream_objects(self):
+        self._run()
+        view_file = os.path.join(self.dag_folder, 'trusted/logistics/regional/stock_view2.view.sql')
+        with open(view_file, 'a') as file:
+            file.write('\n-- changed')
+
+        backend = FakeBackend()
+        runner = BigQueryRunner('test_project', 'test_dataset', self.dag_folder, backend=backend, state_file=self.state_file)
+        with redirect_stdout(io.StringIO()):
+            runner.run_commands(changed_only=True)
+        # The view exists already, so it is replaced in place
+        self.assertEqual([(op['action'], op['object_id']) for op in backend.calls], [
+            ('run_script', 'trusted_logistics_regional_stock_view2'),
+            ('query_to_table', 'refined_logistics_regional_product_table2')
+        ])
+        self.assertEqual(self._run(changed_only=True), [])
+
+    def test_changed_only_cannot_recreate_the_dataset(self):
+        self._run()
+        with self.assertRaises(ValueError):
+            self._run(changed_only=True, recreate=True)
+        # Selected objects can still be recreated when they changed
+        self.assertEqual(self._run(changed_only=True, recreate=True, object_ids=['type:table']), [])
+
+    def test_failed_objects_are_rebuilt(self):
+        backend = FakeBackend(fail=['trusted_logistics_regional_stock_view1'])
+        runner = BigQueryRunner('test_project', 'test_dataset', self.dag_folder, backend=backend, state_file=self.state_file)
+        with redirect_stdout(io.StringIO()), self.assertRaises(RuntimeError):
+            runner.run_commands()
+
+        self.assertEqual(self._run(changed_only=True), [
+            'trusted_logistics_regional_stock_view1',
+            'trusted_logistics_regional_stock_view2',
+            'refined_logistics_regional_product_table1',
+            'refined_logistics_regional_product_table2'
+        ])
+
+if __name__ == '__main__':
+    unittest.main()
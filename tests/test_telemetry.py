@@ -0,0 +1,57 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from bigdag.backends import FakeBackend
+from bigdag.bigquery_runner import BigQueryRunner
+from bigdag.telemetry import JsonLinesWriter, critical_path
+
+class TestTelemetry(unittest.TestCase):
+
+    def test_critical_path(self):
+        order = ['a', 'b', 'c', 'd']
+        dependencies = {'c': {'a', 'b'}, 'd': {'b'}}
+        durations = {'a': 5.0, 'b': 1.0, 'c': 2.0, 'd': 4.0}
+        self.assertEqual(critical_path(order, dependencies, durations), (['a', 'c'], 7.0))
+
+    def test_events(self):
+        events = []
+        runner = BigQueryRunner('test_project', 'test_dataset', 'tests/dag1', backend=FakeBackend())
+        runner.add_listener(events.append)
+        with redirect_stdout(io.StringIO()):
+            runner.run_commands(jobs=2)
+
+        names = [event['event'] for event in events]
+        self.assertEqual(names[0], 'run_start')
+        self.assertEqual(names[-1], 'run_end')
+        self.assertEqual(names.count('object_end'), 3)
+        object_end = [event for event in events if event['event'] == 'object_end'][-1]
+        self.assertEqual(object_end['object_id'], 'financial_refined_monthly_sales')
+        self.assertEqual(object_end['status'], 'ok')
+        self.assertGreaterEqual(object_end['queue_wait'], 0)
+        self.assertEqual(object_end['retries'], 0)
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            runner.print_report()
+        self.assertIn("critical path:", output.getvalue())
+        self.assertIn("  financial_raw_sales", output.getvalue())
+
+    def test_json_lines_writer(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            events_file = os.path.join(tmp_dir, 'logs', 'events.jsonl')
+            runner = BigQueryRunner('test_project', 'test_dataset', 'tests/dag1', backend=FakeBackend(fail=['financial_trusted_sales']))
+            runner.add_listener(JsonLinesWriter(events_file))
+            with redirect_stdout(io.StringIO()), self.assertRaises(RuntimeError):
+                runner.run_commands()
+
+            with open(events_file) as file:
+                events = [json.loads(line) for line in file]
+        failed = [event for event in events if event['event'] == 'object_end' and event['status'] == 'failed']
+        self.assertEqual([event['object_id'] for event in failed], ['financial_trusted_sales'])
+        self.assertEqual(events[-1]['status'], 'failed')
+
+if __name__ == '__main__':
+    unittest.main()
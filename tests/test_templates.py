@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+import unittest
+from bigdag.backends import FakeBackend
+from bigdag.bigquery_runner import BigQueryRunner
+from bigdag.templates import TemplateEngine
+
+class TestTemplateEngine(unittest.TestCase):
+
+    def test_variables_and_macros(self):
+        engine = TemplateEngine(
+            variables={'country': "d'Ivoire", 'days': 7},
+            macros={'recent': {'args': ['column'], 'sql': "{{column}} >= DATE_SUB(CURRENT_DATE(), INTERVAL {{days}} DAY)"}}
+        )
+        rendered = engine.render("SELECT * FROM {{ident(table)}} WHERE country = {{quote(country)}} AND {{ recent('created_at') }}",
+                                 {'table': 'p.d.orders'})
+        self.assertEqual(rendered, "SELECT * FROM `p.d.orders` WHERE country = 'd\\'Ivoire' "
+                                   "AND created_at >= DATE_SUB(CURRENT_DATE(), INTERVAL 7 DAY)")
+
+    def test_templates_are_compiled_once(self):
+        engine = TemplateEngine()
+        content = "SELECT * FROM `{{project_id}}.{{dataset}}.x`"
+        self.assertIs(engine.compile(content), engine.compile(content))
+        self.assertEqual(engine.render(content, {'project_id': 'p', 'dataset': 'a'}), "SELECT * FROM `p.a.x`")
+        self.assertEqual(engine.render(content, {'project_id': 'p', 'dataset': 'b'}), "SELECT * FROM `p.b.x`")
+        self.assertEqual(len(engine._compiled), 1)
+        # Text without placeholders is returned as it is, unknown names and all
+        self.assertEqual(engine.render("SELECT 1 AS x"), "SELECT 1 AS x")
+
+    def test_errors(self):
+        engine = TemplateEngine(macros={'pair': {'args': ['a', 'b'], 'sql': '{{a}}, {{b}}'}})
+        for content in ["{{missing}}", "{{pair(1)}}", "{{unknown(1)}}", "{{a + b}}", "{{"  "a b}}"]:
+            with self.assertRaises(ValueError):
+                engine.render(content)
+
+    def test_runner_reads_vars_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dag_folder = os.path.join(tmp_dir, 'dag')
+            shutil.copytree('tests/dag2', dag_folder)
+            with open(os.path.join(dag_folder, 'vars.yaml'), 'w') as file:
+                file.write("vars:\n  min_quantity: 10\nmacros:\n  positive:\n    args: [column]\n    sql: '{{column}} > {{min_quantity}}'\n")
+            with open(os.path.join(dag_folder, 'trusted/logistics/regional/stock_view1.view.sql'), 'w') as file:
+                file.write("SELECT * FROM `{{project_id}}.{{dataset}}.raw_logistics_regional_stock` WHERE {{positive('quantity')}}")
+
+            runner = BigQueryRunner('test_project', 'test_dataset', dag_folder, backend=FakeBackend())
+            operations = runner.get_operations(object_ids=['trusted_logistics_regional_stock_view1'])
+            self.assertEqual(operations[0]['query'], "SELECT * FROM `test_project.test_dataset.raw_logistics_regional_stock` WHERE quantity > 10")
+            self.assertIn('\\`test_project.test_dataset.raw_logistics_regional_stock\\`', operations[0]['command'])
+            self.assertEqual(operations[0]['argv'][-2], operations[0]['query'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from bigdag.backends import BackendError, FakeBackend
+from bigdag.bigquery_runner import BigQueryRunner
+
+class TestViewBatches(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.state_file = os.path.join(self.tmp_dir.name, 'state.json')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _runner(self, backend):
+        return BigQueryRunner('test_project', 'test_dataset', 'tests/dag2', backend=backend, state_file=self.state_file)
+
+    def test_views_on_the_same_level_share_a_script(self):
+        operations = self._runner(FakeBackend()).get_operations(view_batch_size=10)
+
+        self.assertEqual([op['action'] for op in operations], ['create_external_table', 'run_script', 'query_to_table', 'query_to_table'])
+        batch = operations[1]
+        self.assertEqual(batch['object_ids'], ['trusted_logistics_regional_stock_view1', 'trusted_logistics_regional_stock_view2'])
+        self.assertIn("CREATE VIEW `test_project.test_dataset.trusted_logistics_regional_stock_view1` AS\n"
+                      "SELECT product_id, SUM(quantity) as total_quantity", batch['query'])
+        self.assertEqual(batch['query'].count('CREATE VIEW'), 2)
+
+    def test_batched_views_are_replaced_like_single_views(self):
+        runner = self._runner(FakeBackend())
+        with redirect_stdout(io.StringIO()):
+            runner.run_commands()
+
+        # Views built before are replaced whatever the batch size
+        operations = self._runner(FakeBackend()).get_operations(view_batch_size=10)
+        batch = next(op for op in operations if op['action'] == 'run_script')
+        self.assertEqual(batch['query'].count('CREATE OR REPLACE VIEW'), 2)
+        operations = self._runner(FakeBackend()).get_operations(object_ids=['type:view'])
+        self.assertEqual([op['action'] for op in operations], ['run_script', 'run_script'])
+        self.assertTrue(all(op['query'].startswith('CREATE OR REPLACE VIEW') for op in operations))
+        # Unless they are recreated on purpose
+        operations = self._runner(FakeBackend()).get_operations(object_ids=['type:view'], recreate=True)
+        self.assertEqual([op['action'] for op in operations], ['drop_table', 'create_view', 'drop_table', 'create_view'])
+
+    def test_batch_size_limits_the_views_per_script(self):
+        operations = self._runner(FakeBackend()).get_operations(view_batch_size=1)
+        self.assertEqual([op['action'] for op in operations].count('create_view'), 2)
+
+    def test_batched_run_records_each_view(self):
+        backend = FakeBackend()
+        runner = self._runner(backend)
+        with redirect_stdout(io.StringIO()):
+            runner.run_commands(jobs=2, view_batch_size=10)
+
+        self.assertEqual(len(backend.calls), 4)
+        self.assertEqual(runner.recorder.objects['trusted_logistics_regional_stock_view2']['batch'], 2)
+        self.assertEqual(runner.get_changed_objects(), [])
+
+    def test_failed_batch_is_attributed_per_view(self):
+        backend = FakeBackend(fail=['trusted_logistics_regional_stock_view2'])
+        runner = self._runner(backend)
+        with redirect_stdout(io.StringIO()) as output, self.assertRaises(BackendError):
+            runner.run_commands(view_batch_size=10)
+
+        # The batch failed, then each view was created on its own
+        self.assertEqual([op['action'] for op in backend.calls[1:]], ['run_script', 'run_script', 'run_script'])
+        self.assertEqual([op.get('object_id') for op in backend.calls[2:]],
+                         ['trusted_logistics_regional_stock_view1', 'trusted_logistics_regional_stock_view2'])
+        self.assertEqual(runner.recorder.objects['trusted_logistics_regional_stock_view1']['status'], 'ok')
+        self.assertEqual(runner.recorder.objects['trusted_logistics_regional_stock_view2']['status'], 'failed')
+        self.assertIn('creating view trusted_logistics_regional_stock_view2', output.getvalue())
+
+    def test_views_created_by_a_failed_batch_are_replaced(self):
+        backend = DatasetBackend(fail=['trusted_logistics_regional_stock_view2'])
+        runner = self._runner(backend)
+        with redirect_stdout(io.StringIO()), self.assertRaises(BackendError):
+            runner.run_commands(view_batch_size=10)
+
+        self.assertEqual(runner.recorder.objects['trusted_logistics_regional_stock_view1']['status'], 'ok')
+        self.assertEqual(runner.recorder.objects['trusted_logistics_regional_stock_view2']['status'], 'failed')
+        self.assertIn('trusted_logistics_regional_stock_view1', backend.existing)
+
+class DatasetBackend(FakeBackend):
+    # Keeps the objects of the dataset: bq mk fails on existing ones, and a
+    # script stops at its failing statement after running the ones before it
+
+    def __init__(self, fail=()):
+        super().__init__(fail=fail)
+        self.existing = set()
+
+    def execute(self, operation):
+        obj_id = operation.get('object_id')
+        if operation['action'] in ('create_view', 'create_external_table') and obj_id in self.existing:
+            raise BackendError(f"Command failed: {operation['command']}", details='Already Exists')
+        if operation['action'] == 'drop_table':
+            self.existing.discard(obj_id)
+            return super().execute(operation)
+        for created in operation.get('object_ids') or [obj_id]:
+            if created in self.fail:
+                break
+            self.existing.add(created)
+        return super().execute(operation)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from bigdag.backends import FakeBackend
+from bigdag.bigquery_runner import BigQueryRunner
+from bigdag.watch import Watcher
+
+class TestWatch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dag_folder = os.path.join(self.tmp_dir.name, 'dag')
+        shutil.copytree('tests/dag2', self.dag_folder)
+        self.backend = FakeBackend()
+        self.runner = BigQueryRunner('test_project', 'test_dataset', self.dag_folder, backend=self.backend)
+        self.watcher = Watcher(self.runner, interval=0.01, debounce=0)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write(self, relative_path, content):
+        file_path = os.path.join(self.dag_folder, relative_path)
+        with open(file_path, 'w') as file:
+            file.write(content)
+        # Make sure the change is seen even within the mtime resolution
+        stat = os.stat(file_path)
+        os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        return file_path
+
+    def test_changed_view_redeploys_downstream(self):
+        self._write('trusted/logistics/regional/stock_view1.view.sql',
+                    "SELECT product_id, SUM(quantity) AS total_quantity\nFROM raw_logistics_regional_stock\nGROUP BY 1;")
+        changed = self.watcher.poll()
+        self.assertEqual(changed, {os.path.join(self.dag_folder, 'trusted/logistics/regional/stock_view1.view.sql')})
+
+        with redirect_stdout(io.StringIO()):
+            deployed = self.watcher.deploy(changed)
+        self.assertEqual(deployed, ['trusted_logistics_regional_stock_view1', 'refined_logistics_regional_product_table1'])
+        # The view exists already, so it is replaced in place
+        self.assertEqual([(op['action'], op['object_id']) for op in self.backend.calls], [
+            ('run_script', 'trusted_logistics_regional_stock_view1'),
+            ('query_to_table', 'refined_logistics_regional_product_table1')
+        ])
+        self.assertIn('GROUP BY 1', self.backend.calls[0]['query'])
+        self.assertEqual(self.watcher.poll(), set())
+
+    def test_selectors_limit_the_deploy(self):
+        self.watcher.object_ids = ['trusted_*']
+        self._write('trusted/logistics/regional/stock_view1.view.sql', "SELECT product_id FROM raw_logistics_regional_stock")
+        with redirect_stdout(io.StringIO()):
+            deployed = self.watcher.deploy(self.watcher.poll())
+        self.assertEqual(deployed, ['trusted_logistics_regional_stock_view1'])
+
+        self.watcher.object_ids = ['type:table']
+        self._write('trusted/logistics/regional/stock_view1.view.sql', "SELECT product_id, region FROM raw_logistics_regional_stock")
+        with redirect_stdout(io.StringIO()):
+            deployed = self.watcher.deploy(self.watcher.poll())
+        self.assertEqual(deployed, ['refined_logistics_regional_product_table1'])
+
+    def test_new_file_updates_edges(self):
+        self._write('refined/logistics/regional/product_table3.table.sql',
+                    "SELECT * FROM trusted_logistics_regional_stock_view2 JOIN refined_logistics_regional_product_table1 USING (product_id);")
+        changed = self.watcher.poll()
+
+        with redirect_stdout(io.StringIO()):
+            deployed = self.watcher.deploy(changed)
+        self.assertEqual(deployed, ['refined_logistics_regional_product_table3'])
+        self.assertEqual([op['action'] for op in self.backend.calls], ['query_to_table'])
+        self.assertEqual(self.runner.dag.get_dependencies()['refined_logistics_regional_product_table3'], {
+            'trusted_logistics_regional_stock_view2',
+            'refined_logistics_regional_product_table1'
+        })
+        self.assertEqual(self.runner.dag.get_execution_order(), BigQueryRunner(
+            'test_project', 'test_dataset', self.dag_folder, backend=FakeBackend()).dag.get_execution_order())
+
+    def test_removed_reference_drops_edge(self):
+        self._write('refined/logistics/regional/product_table2.table.sql', "SELECT 1 AS region;")
+        with redirect_stdout(io.StringIO()):
+            self.watcher.deploy(self.watcher.poll())
+        self.assertEqual(self.runner.dag.get_dependencies()['refined_logistics_regional_product_table2'], set())
+
+    def test_vars_file_redeploys_queries(self):
+        self._write('vars.yaml', "vars:\n  min_quantity: 1\n")
+        self._write('trusted/logistics/regional/stock_view1.view.sql',
+                    "SELECT product_id FROM raw_logistics_regional_stock WHERE quantity > {{min_quantity}}")
+        with redirect_stdout(io.StringIO()):
+            self.watcher.deploy(self.watcher.poll())
+
+        self._write('vars.yaml', "vars:\n  min_quantity: 10\n")
+        self.backend.calls.clear()
+        with redirect_stdout(io.StringIO()):
+            deployed = self.watcher.deploy(self.watcher.poll())
+        self.assertEqual(deployed, [
+            'trusted_logistics_regional_stock_view1',
+            'trusted_logistics_regional_stock_view2',
+            'refined_logistics_regional_product_table1',
+            'refined_logistics_regional_product_table2'
+        ])
+        self.assertIn('quantity > 10', self.backend.calls[0]['query'])
+
+    def test_removed_file_keeps_manual_edges(self):
+        dag_folder = os.path.join(self.tmp_dir.name, 'dag1')
+        shutil.copytree('tests/dag1', dag_folder)
+        runner = BigQueryRunner('test_project', 'test_dataset', dag_folder, backend=FakeBackend())
+        watcher = Watcher(runner, interval=0.01, debounce=0)
+
+        os.remove(os.path.join(dag_folder, 'financial/trusted/sales.view.sql'))
+        runner.dag.refresh(watcher.poll())
+        fresh = BigQueryRunner('test_project', 'test_dataset', dag_folder, backend=FakeBackend()).dag
+        self.assertEqual(set(runner.dag.get_graph().edges), set(fresh.get_graph().edges))
+        self.assertIn(('financial_raw_sales', 'financial_trusted_sales'), runner.dag.get_graph().edges)
+
+if __name__ == '__main__':
+    unittest.main()